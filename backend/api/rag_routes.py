@@ -3,9 +3,11 @@ RAG API routes for document processing and retrieval
 """
 import os
 import logging
-from flask import Blueprint, request, jsonify
+import tempfile
+from flask import Blueprint, request
 from werkzeug.utils import secure_filename
 from services.rag_service import RAGService
+from utils.helpers import json_response
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +30,10 @@ def create_rag_blueprint(config) -> Blueprint:
         """List all available indexes"""
         try:
             result = rag_service.list_indexes()
-            return jsonify(result), 200
+            return json_response(result), 200
         except Exception as e:
             logger.error(f"Error listing indexes: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes', methods=['POST'])
     def create_index():
@@ -41,7 +43,7 @@ def create_rag_blueprint(config) -> Blueprint:
             index_name = data.get('index_name')
             
             if not index_name:
-                return jsonify({'error': 'index_name is required'}), 400
+                return json_response({'error': 'index_name is required'}), 400
             
             # Sanitize index name
             index_name = secure_filename(index_name)
@@ -49,13 +51,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.create_index(index_name)
             
             if 'error' in result:
-                return jsonify(result), 400
+                return json_response(result), 400
             
-            return jsonify(result), 201
+            return json_response(result), 201
             
         except Exception as e:
             logger.error(f"Error creating index: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes/<index_name>', methods=['GET'])
     def get_index_info(index_name):
@@ -64,13 +66,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.get_index_info(index_name)
             
             if 'error' in result:
-                return jsonify(result), 404
+                return json_response(result), 404
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error getting index info: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes/<index_name>', methods=['DELETE'])
     def delete_index(index_name):
@@ -79,13 +81,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.delete_index(index_name)
             
             if 'error' in result:
-                return jsonify(result), 404
+                return json_response(result), 404
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error deleting index: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes/<index_name>/documents', methods=['GET'])
     def list_documents(index_name):
@@ -94,13 +96,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.list_documents(index_name)
             
             if 'error' in result:
-                return jsonify(result), 404
+                return json_response(result), 404
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error listing documents: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes/<index_name>/documents/<document_id>', methods=['GET'])
     def get_document_details(index_name, document_id):
@@ -109,13 +111,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.get_document_details(index_name, document_id)
             
             if 'error' in result:
-                return jsonify(result), 404
+                return json_response(result), 404
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error getting document details: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/indexes/<index_name>/documents/<document_id>', methods=['DELETE'])
     def delete_document(index_name, document_id):
@@ -124,13 +126,13 @@ def create_rag_blueprint(config) -> Blueprint:
             result = rag_service.delete_document(index_name, document_id)
             
             if 'error' in result:
-                return jsonify(result), 404
+                return json_response(result), 404
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/upload', methods=['POST'])
     def upload_documents():
@@ -139,16 +141,16 @@ def create_rag_blueprint(config) -> Blueprint:
             # Check if index_name is provided
             index_name = request.form.get('index_name')
             if not index_name:
-                return jsonify({'error': 'index_name is required'}), 400
+                return json_response({'error': 'index_name is required'}), 400
             
             # Check if files are provided
             if 'files' not in request.files:
-                return jsonify({'error': 'No files provided'}), 400
+                return json_response({'error': 'No files provided'}), 400
             
             files = request.files.getlist('files')
             
             if not files or all(file.filename == '' for file in files):
-                return jsonify({'error': 'No files selected'}), 400
+                return json_response({'error': 'No files selected'}), 400
             
             # Process metadata if provided
             metadata = {}
@@ -161,51 +163,65 @@ def create_rag_blueprint(config) -> Blueprint:
             
             results = []
             errors = []
-            
-            # Process each file
-            for file in files:
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    
-                    # Save file temporarily
-                    temp_path = os.path.join(config.UPLOAD_FOLDER, 'temp', filename)
-                    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-                    file.save(temp_path)
-                    
-                    try:
-                        # Process and add to index
-                        result = rag_service.upload_document(
-                            index_name=index_name,
-                            filepath=temp_path,
-                            filename=filename,
-                            metadata=metadata
-                        )
-                        
-                        if 'error' in result:
-                            errors.append({
-                                'filename': filename,
-                                'error': result['error']
-                            })
-                        else:
-                            results.append({
-                                'filename': filename,
-                                'document_id': result['document_id'],
-                                'chunks': result['chunks'],
-                                'size': result['size']
-                            })
-                    
-                    finally:
-                        # Clean up temp file
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
+            saved = []
+            
+            try:
+                # Save each allowed file temporarily, under a unique name so files that share
+                # a filename (in this batch or a concurrent one) don't overwrite each other;
+                # filename is kept for display and metadata
+                temp_dir = os.path.join(config.UPLOAD_FOLDER, 'temp')
+                os.makedirs(temp_dir, exist_ok=True)
+                for file in files:
+                    if file and allowed_file(file.filename):
+                        filename = secure_filename(file.filename)
+                        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=os.path.splitext(filename)[1])
+                        saved.append((temp_path, filename))
+                        with os.fdopen(fd, 'wb') as temp_file:
+                            file.save(temp_file)
+                    else:
+                        errors.append({
+                            'filename': file.filename,
+                            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+                        })
                 
-                else:
-                    errors.append({
-                        'filename': file.filename,
-                        'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-                    })
-            
-            return jsonify({
+                if len(saved) == 1:
+                    # Single file: process in-process rather than paying for worker startup
+                    temp_path, filename = saved[0]
+                    result = rag_service.upload_document(
+                        index_name=index_name,
+                        filepath=temp_path,
+                        filename=filename,
+                        metadata=metadata
+                    )
+                    if 'error' in result:
+                        errors.append({'filename': filename, 'error': result['error']})
+                    else:
+                        results.append({
+                            'filename': filename,
+                            'document_id': result['document_id'],
+                            'chunks': result['chunks'],
+                            'size': result['size']
+                        })
+                elif saved:
+                    # Several files: extract and chunk in parallel, index them together
+                    result = rag_service.upload_documents(
+                        index_name=index_name,
+                        files=saved,
+                        metadata=metadata
+                    )
+                    if 'error' in result:
+                        errors.extend({'filename': filename, 'error': result['error']} for _, filename in saved)
+                    else:
+                        results.extend(result['processed'])
+                        errors.extend(result['errors'])
+            
+            finally:
+                # Clean up temp files
+                for temp_path, _ in saved:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+            
+            return json_response({
                 'success': len(results) > 0,
                 'processed': results,
                 'errors': errors,
@@ -215,7 +231,7 @@ def create_rag_blueprint(config) -> Blueprint:
             
         except Exception as e:
             logger.error(f"Error uploading documents: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/query', methods=['POST'])
     def query_documents():
@@ -227,7 +243,7 @@ def create_rag_blueprint(config) -> Blueprint:
             query = data.get('query')
             
             if not index_name or not query:
-                return jsonify({'error': 'index_name and query are required'}), 400
+                return json_response({'error': 'index_name and query are required'}), 400
             
             # Optional parameters
             k = data.get('k', 5)
@@ -235,7 +251,7 @@ def create_rag_blueprint(config) -> Blueprint:
             min_score = data.get('min_score', 0.0)  # Minimum relevance score threshold
             
             if mode not in ['vector', 'keyword', 'hybrid']:
-                return jsonify({'error': 'mode must be one of: vector, keyword, hybrid'}), 400
+                return json_response({'error': 'mode must be one of: vector, keyword, hybrid'}), 400
             
             result = rag_service.query(
                 index_name=index_name,
@@ -246,13 +262,13 @@ def create_rag_blueprint(config) -> Blueprint:
             )
             
             if 'error' in result:
-                return jsonify(result), 400
+                return json_response(result), 400
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error querying documents: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/query-multiple', methods=['POST'])
     def query_multiple_indexes():
@@ -264,10 +280,10 @@ def create_rag_blueprint(config) -> Blueprint:
             query = data.get('query')
             
             if not index_names or not query:
-                return jsonify({'error': 'index_names (array) and query are required'}), 400
+                return json_response({'error': 'index_names (array) and query are required'}), 400
             
             if not isinstance(index_names, list):
-                return jsonify({'error': 'index_names must be an array'}), 400
+                return json_response({'error': 'index_names must be an array'}), 400
             
             # Optional parameters
             k = data.get('k', 5)
@@ -275,7 +291,7 @@ def create_rag_blueprint(config) -> Blueprint:
             min_score = data.get('min_score', 0.0)  # Minimum relevance score threshold
             
             if mode not in ['vector', 'keyword', 'hybrid']:
-                return jsonify({'error': 'mode must be one of: vector, keyword, hybrid'}), 400
+                return json_response({'error': 'mode must be one of: vector, keyword, hybrid'}), 400
             
             result = rag_service.query_multiple_indexes(
                 index_names=index_names,
@@ -286,26 +302,26 @@ def create_rag_blueprint(config) -> Blueprint:
             )
             
             if 'error' in result:
-                return jsonify(result), 400
+                return json_response(result), 400
             
-            return jsonify(result), 200
+            return json_response(result), 200
             
         except Exception as e:
             logger.error(f"Error querying multiple indexes: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
     
     @rag.route('/health', methods=['GET'])
     def health_check():
         """RAG service health check"""
         try:
             indexes = rag_service.list_indexes()
-            return jsonify({
+            return json_response({
                 'status': 'healthy',
                 'indexes_count': len(indexes.get('indexes', [])),
                 'service': 'RAG Service'
             }), 200
         except Exception as e:
-            return jsonify({
+            return json_response({
                 'status': 'unhealthy',
                 'error': str(e)
             }), 500
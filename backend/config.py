@@ -75,7 +75,13 @@ class Config:
     RAG_MAX_CONTEXT_LENGTH = int(os.environ.get('RAG_MAX_CONTEXT_LENGTH', 2000))  # Max context chars to include
     RAG_ENABLE_CACHING = os.environ.get('RAG_ENABLE_CACHING', 'True').lower() == 'true'
     RAG_CACHE_SIZE = int(os.environ.get('RAG_CACHE_SIZE', 100))  # Number of queries to cache
+    RAG_QUERY_CACHE_TTL = float(os.environ.get('RAG_QUERY_CACHE_TTL', 300))  # Seconds a cached query response stays valid
     RAG_MIN_RELEVANCE_SCORE = float(os.environ.get('RAG_MIN_RELEVANCE_SCORE', 0.3))  # Filter low relevance results
+    RAG_INGEST_WORKERS = int(os.environ.get('RAG_INGEST_WORKERS', 4))  # Processes for parallel multi-file uploads
+    RAG_QUERY_WORKERS = int(os.environ.get('RAG_QUERY_WORKERS', 8))  # Threads for querying several indexes at once
+    RAG_VECTOR_DTYPE = os.environ.get('RAG_VECTOR_DTYPE', 'float32')  # 'float32' or 'int8' (quantized vector search)
+    RAG_ENABLE_CHUNK_CACHE = os.environ.get('RAG_ENABLE_CHUNK_CACHE', 'True').lower() == 'true'  # Reuse chunks of re-uploaded files
+    RAG_CHUNK_CACHE_MAX_ENTRIES = int(os.environ.get('RAG_CHUNK_CACHE_MAX_ENTRIES', 1000))  # Least recently used entries beyond this are pruned
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -0,0 +1,191 @@
+"""
+Subprocess worker that owns a single llama-cpp-python model.
+Keeps Python-side generation overhead off the server's GIL and isolates native crashes.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Spawn (not fork) so the child never inherits CUDA/torch state from the server
+_mp_context = multiprocessing.get_context('spawn')
+
+_STREAM_END = object()
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when the worker process exits while requests are pending."""
+    pass
+
+class LlamaWorker(_mp_context.Process):
+    """Dedicated child process running one Llama instance, driven over a pipe."""
+    
+    def __init__(self, model_path: str, model_params: Dict[str, Any]):
+        super().__init__(name=f"LlamaWorker-{model_path}", daemon=True)
+        self.model_path = model_path
+        self.model_params = model_params
+        self._conn, self._child_conn = _mp_context.Pipe()
+        
+        # Parent-side state (never used in the child)
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, Any] = {}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = None
+    
+    def __getstate__(self):
+        # Only ship what the child needs across the spawn boundary
+        state = self.__dict__.copy()
+        for key in ('_conn', '_request_ids', '_pending', '_pending_lock', '_send_lock', '_reader'):
+            state.pop(key, None)
+        return state
+    
+    # ----- child side -----
+    
+    def run(self):
+        """Child process main loop: load the model, then serve requests until told to stop."""
+        from llama_cpp import Llama
+        
+        conn = self._child_conn
+        try:
+            model = Llama(**self.model_params)
+        except Exception as e:
+            conn.send((None, 'error', f"{type(e).__name__}: {e}"))
+            return
+        conn.send((None, 'ready', None))
+        
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            
+            req_id, prompt, gen_params = message
+            try:
+                if gen_params.get('stream'):
+                    for chunk in model(prompt, **gen_params):
+                        conn.send((req_id, 'chunk', chunk))
+                    conn.send((req_id, 'done', None))
+                else:
+                    conn.send((req_id, 'result', model(prompt, **gen_params)))
+            except Exception as e:
+                conn.send((req_id, 'error', f"{type(e).__name__}: {e}"))
+    
+    # ----- parent side -----
+    
+    def start(self):
+        """Start the child and block until the model has loaded (or failed to)."""
+        super().start()
+        self._child_conn.close()
+        
+        try:
+            _, status, payload = self._conn.recv()
+        except EOFError:
+            status, payload = 'error', f"process exited with code {self.exitcode}"
+        if status != 'ready':
+            self.join(timeout=5)
+            raise RuntimeError(f"Failed to load model {self.model_path}: {payload}")
+        
+        self._reader = threading.Thread(
+            target=self._read_responses, name=f"{self.name}-reader", daemon=True
+        )
+        self._reader.start()
+        logger.info(f"Started {self.name} (pid {self.pid})")
+    
+    def _read_responses(self):
+        """Route responses from the child to the waiting futures/stream queues."""
+        while True:
+            try:
+                req_id, status, payload = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            
+            with self._pending_lock:
+                target = self._pending.get(req_id)
+                if status in ('result', 'error', 'done'):
+                    self._pending.pop(req_id, None)
+            if target is None:
+                continue
+            
+            if isinstance(target, Future):
+                if status == 'result':
+                    target.set_result(payload)
+                else:
+                    target.set_exception(RuntimeError(payload))
+            elif status == 'chunk':
+                target.put(payload)
+            elif status == 'done':
+                target.put(_STREAM_END)
+            else:
+                target.put(RuntimeError(payload))
+        
+        # The child is gone: fail everything still waiting on it
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        error = WorkerCrashedError(f"{self.name} exited unexpectedly")
+        for target in pending.values():
+            if isinstance(target, Future):
+                target.set_exception(error)
+            else:
+                target.put(error)
+    
+    def _send(self, prompt: str, gen_params: Dict[str, Any], target) -> None:
+        req_id = next(self._request_ids)
+        with self._pending_lock:
+            self._pending[req_id] = target
+        try:
+            with self._send_lock:
+                self._conn.send((req_id, prompt, gen_params))
+        except (OSError, ValueError) as e:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+            raise WorkerCrashedError(f"{self.name} is not accepting requests: {e}")
+    
+    def submit_future(self, prompt: str, **gen_params) -> Future:
+        """Send a non-streaming request; returns a thread-safe Future for the result."""
+        future = Future()
+        self._send(prompt, gen_params, future)
+        return future
+    
+    async def submit(self, prompt: str, **gen_params) -> Dict[str, Any]:
+        """Send a non-streaming request and await its result."""
+        return await asyncio.wrap_future(self.submit_future(prompt, **gen_params))
+    
+    def stream(self, prompt: str, **gen_params) -> Iterator[Dict[str, Any]]:
+        """Send a streaming request and yield completion chunks as they arrive."""
+        chunks = queue.Queue()
+        self._send(prompt, {**gen_params, 'stream': True}, chunks)
+        while True:
+            chunk = chunks.get()
+            if chunk is _STREAM_END:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    
+    def __call__(self, prompt: str, **gen_params):
+        """Mirror Llama.__call__ so callers can treat the worker like a model."""
+        if gen_params.get('stream'):
+            return self.stream(prompt, **gen_params)
+        return self.submit_future(prompt, **gen_params).result()
+    
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the child process, terminating it if it doesn't exit in time."""
+        try:
+            with self._send_lock:
+                self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.join(timeout=timeout)
+        if self.is_alive():
+            logger.warning(f"{self.name} did not exit in {timeout}s, terminating")
+            self.terminate()
+            self.join(timeout=timeout)
+        self._conn.close()
@@ -4,47 +4,265 @@ Direct llama-cpp-python implementation for maximum efficiency and performance.
 """
 import asyncio
 import logging
+import os
+import struct
+import subprocess
 import time
 import gc
 import threading
+import itertools
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, Any, Optional, AsyncGenerator
-from llama_cpp import Llama
+import llama_cpp
 from .model_pool import ModelInstance
+from .llama_worker import LlamaWorker
 import torch
 
+# Optional NVML bindings for reading free VRAM; falls back to nvidia-smi
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
 logger = logging.getLogger(__name__)
 
+# Default stop sequences shared by every request that doesn't override them.
+# llama_cpp only honours a list here (a tuple is silently dropped); it never mutates it.
+_DEFAULT_STOP = ["</s>", "\n\nQuestion:", "\n\nHuman:", "\n\n"]
+
+def _version_tuple(version: str) -> tuple:
+    """Convert a dotted version string into a comparable tuple of ints."""
+    parts = []
+    for part in version.split('.'):
+        digits = ''.join(c for c in part if c.isdigit())
+        parts.append(int(digits) if digits else 0)
+    return tuple(parts)
+
+_LLAMA_CPP_VERSION = _version_tuple(getattr(llama_cpp, '__version__', '0'))
+
+# FlashAttention (flash_attn) requires llama-cpp-python >= 0.2.62
+_SUPPORTS_FLASH_ATTN = _LLAMA_CPP_VERSION >= (0, 2, 62)
+
+# Quantized KV cache (type_k/type_v) requires llama-cpp-python >= 0.2.75
+_SUPPORTS_KV_QUANT = _LLAMA_CPP_VERSION >= (0, 2, 75)
+
+_GB = 1024 ** 3
+
+# Fallbacks used when the GGUF header can't be read (typical 7B llama shape)
+_DEFAULT_N_LAYERS = 32
+_DEFAULT_HIDDEN_DIM = 4096
+
+# Used when the per-core L2 size can't be read from sysfs
+_DEFAULT_L2_CACHE_BYTES = 1024 * 1024
+
+# GGUF metadata value types: scalar type id -> struct format
+_GGUF_SCALAR_FORMATS = {
+    0: '<B', 1: '<b', 2: '<H', 3: '<h', 4: '<I', 5: '<i',
+    6: '<f', 7: '<?', 10: '<Q', 11: '<q', 12: '<d',
+}
+_GGUF_STRING = 8
+_GGUF_ARRAY = 9
+
+def _read_gguf_model_shape(model_path: str) -> tuple:
+    """Read (block_count, embedding_length) from a GGUF header, with safe fallbacks."""
+    def read(f, fmt):
+        return struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0]
+    
+    def read_string(f):
+        return f.read(read(f, '<Q')).decode('utf-8', errors='replace')
+    
+    def read_value(f, value_type):
+        if value_type == _GGUF_STRING:
+            return read_string(f)
+        if value_type == _GGUF_ARRAY:
+            item_type = read(f, '<I')
+            count = read(f, '<Q')
+            if item_type in _GGUF_SCALAR_FORMATS:
+                # Skip scalar arrays (e.g. token scores) without decoding them
+                f.seek(count * struct.calcsize(_GGUF_SCALAR_FORMATS[item_type]), 1)
+            else:
+                for _ in range(count):
+                    read_value(f, item_type)
+            return None
+        return read(f, _GGUF_SCALAR_FORMATS[value_type])
+    
+    try:
+        with open(model_path, 'rb') as f:
+            if f.read(4) != b'GGUF' or read(f, '<I') < 2:
+                raise ValueError("unsupported GGUF header")
+            read(f, '<Q')  # tensor count
+            kv_count = read(f, '<Q')
+            
+            architecture = None
+            values = {}
+            for _ in range(kv_count):
+                key = read_string(f)
+                value = read_value(f, read(f, '<I'))
+                if key == 'general.architecture':
+                    architecture = value
+                elif key.endswith(('.block_count', '.embedding_length')):
+                    values[key] = value
+                
+                if architecture and all(
+                    f"{architecture}.{name}" in values
+                    for name in ('block_count', 'embedding_length')
+                ):
+                    return (
+                        int(values[f"{architecture}.block_count"]),
+                        int(values[f"{architecture}.embedding_length"]),
+                    )
+    except Exception as e:
+        logger.debug(f"Could not read GGUF metadata from {model_path}: {e}")
+    
+    return _DEFAULT_N_LAYERS, _DEFAULT_HIDDEN_DIM
+
+@lru_cache(maxsize=None)
+def _read_l2_cache_bytes() -> int:
+    """Read the per-core L2 cache size on Linux, falling back to 1 MiB."""
+    cache_dir = '/sys/devices/system/cpu/cpu0/cache/index2'
+    try:
+        with open(os.path.join(cache_dir, 'level')) as f:
+            if f.read().strip() != '2':
+                return _DEFAULT_L2_CACHE_BYTES
+        with open(os.path.join(cache_dir, 'size')) as f:
+            size = f.read().strip().upper()
+        multiplier = {'K': 1024, 'M': 1024 ** 2}.get(size[-1:], 1)
+        return int(size.rstrip('KM')) * multiplier
+    except (OSError, ValueError):
+        return _DEFAULT_L2_CACHE_BYTES
+
+def _read_free_vram() -> int:
+    """
+    Free memory on GPU 0 in bytes, read through NVML (or nvidia-smi without pynvml).
+    Models run in worker processes, so unlike torch.cuda.mem_get_info this must not
+    create a CUDA context here: it would hold VRAM for the life of the server.
+    """
+    if pynvml is not None:
+        pynvml.nvmlInit()
+        try:
+            return pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(0)).free
+        finally:
+            pynvml.nvmlShutdown()
+    
+    output = subprocess.run(
+        ['nvidia-smi', '--query-gpu=memory.free', '--format=csv,noheader,nounits', '--id=0'],
+        capture_output=True, text=True, timeout=10, check=True
+    ).stdout
+    return int(output.split()[0]) * 1024 * 1024  # Reported in MiB
+
+def _probe_hardware() -> Dict[str, Optional[int]]:
+    """Measure free VRAM, free RAM and CPU cores available for model loading."""
+    free_vram = 0
+    if torch.cuda.is_available():  # Counts devices without creating a context
+        try:
+            free_vram = _read_free_vram()
+        except Exception as e:
+            logger.warning(f"Could not query free GPU memory: {e}")
+    
+    try:
+        import psutil
+        free_ram = psutil.virtual_memory().available
+    except ImportError:
+        free_ram = None  # Unknown; don't constrain on RAM
+    
+    return {
+        'free_vram': free_vram,
+        'free_ram': free_ram,
+        'n_cores': os.cpu_count() or 1,
+        'l2_cache_bytes': _read_l2_cache_bytes(),
+    }
+
+def _pick_params(
+    file_size: int,
+    free_vram: int,
+    free_ram: Optional[int],
+    n_cores: int,
+    n_layers: int = _DEFAULT_N_LAYERS,
+    hidden_dim: int = _DEFAULT_HIDDEN_DIM,
+    n_ctx: int = 4096,
+    n_gpu_layers: int = -1,
+    l2_cache_bytes: int = _DEFAULT_L2_CACHE_BYTES,
+) -> Dict[str, Any]:
+    """
+    Choose Llama parameters that fit the given hardware.
+    
+    n_ctx and n_gpu_layers are the requested values (-1 means all layers);
+    both are reduced to what fits in memory.
+    """
+    per_layer_bytes = max(file_size // max(n_layers, 1), 1)
+    kv_bytes_per_token_layer = 2 * hidden_dim * 2  # f16 K and V rows
+    
+    # Offload as many layers (weights plus their KV cache slice) as fit in VRAM,
+    # keeping 1GB headroom for scratch buffers
+    usable_vram = max(free_vram - _GB, 0)
+    requested_layers = n_layers if n_gpu_layers < 0 else min(n_gpu_layers, n_layers)
+    gpu_layers = min(
+        requested_layers,
+        usable_vram // (per_layer_bytes + n_ctx * kv_bytes_per_token_layer)
+    )
+    
+    # Layers left on the CPU keep their KV cache in RAM: shrink n_ctx if it won't fit
+    cpu_layers = n_layers - gpu_layers
+    if cpu_layers > 0 and free_ram is not None:
+        kv_budget = max(free_ram - cpu_layers * per_layer_bytes, 0)
+        max_ctx = kv_budget // (cpu_layers * kv_bytes_per_token_layer)
+        n_ctx = max(512, min(n_ctx, max_ctx // 256 * 256))
+    
+    # Size prefill batches so one thread's fp16 activation tile stays resident in L2
+    n_batch = max(128, min(2048, l2_cache_bytes // (hidden_dim * 4)))
+    
+    return {
+        'n_gpu_layers': -1 if gpu_layers >= n_layers else int(gpu_layers),
+        'n_ctx': int(n_ctx),
+        'n_batch': n_batch,
+        'n_threads': min(n_cores, 8),
+        'verbose': False,
+        'use_mmap': True,
+        'use_mlock': free_ram is not None and free_ram > 2 * file_size,
+        'f16_kv': True,
+        'flash_attn': True,
+        'logits_all': False,
+    }
+
 class OptimizedModelInstance:
-    """Optimized model instance without LangChain wrapper."""
+    """Optimized model instance without LangChain wrapper, backed by a worker process."""
     
-    def __init__(self, model: Llama, model_path: str):
+    def __init__(self, model: LlamaWorker, model_path: str, last_used: int = 0):
         self.model = model
         self.model_path = model_path
         self.usage_count = 0
-        self.last_used = time.time()
-        self.lock = threading.Lock()
+        self.last_used = last_used  # Pool-wide use sequence number, not wall-clock
     
-    def update_usage(self):
-        """Update usage statistics."""
-        with self.lock:
-            self.usage_count += 1
-            self.last_used = time.time()
+    def update_usage(self, sequence: int):
+        """Update usage statistics (called with the pool lock held)."""
+        self.usage_count += 1
+        self.last_used = sequence
 
 class OptimizedModelPool:
     """Optimized model pool manager for direct llama-cpp-python models."""
     
     def __init__(self, max_models: int = 3):
         self.max_models = max_models
-        self.models = {}
-        self.model_usage = {}
+        # Kept in recency order: least recently used first, most recently used last
+        self.models: OrderedDict[str, OptimizedModelInstance] = OrderedDict()
+        self._use_sequence = itertools.count(1)
         self.lock = threading.Lock()
     
     def get_or_load_model(self, model_path: str, **params) -> OptimizedModelInstance:
         """Get existing model or load new one with LRU eviction."""
         with self.lock:
-            if model_path in self.models:
-                instance = self.models[model_path]
-                instance.update_usage()
+            instance = self.models.get(model_path)
+            if instance is not None and not instance.model.is_alive():
+                # The worker process died (e.g. a native crash): drop it and load a fresh one
+                logger.warning(f"Worker for {model_path} exited (code {instance.model.exitcode}), reloading")
+                del self.models[model_path]
+                instance.model.close()
+                instance = None
+            if instance is not None:
+                self.models.move_to_end(model_path)
+                instance.update_usage(next(self._use_sequence))
                 return instance
             
             # If at capacity, remove least recently used model
@@ -53,101 +271,70 @@ class OptimizedModelPool:
             
             # Load new model with optimizations
             model = self._create_optimized_model(model_path, **params)
-            instance = OptimizedModelInstance(model, model_path)
+            instance = OptimizedModelInstance(model, model_path, next(self._use_sequence))
             
             self.models[model_path] = instance
             logger.info(f"Loaded optimized model: {model_path}")
             
             return instance
     
-    def _create_optimized_model(self, model_path: str, **params) -> Llama:
-        """Create optimized Llama model with best performance settings and error handling."""
-        # Get file size to estimate memory requirements
-        import os
-        file_size_gb = os.path.getsize(model_path) / (1024**3)
+    def _create_optimized_model(self, model_path: str, **params) -> LlamaWorker:
+        """Create optimized Llama model with parameters validated against the host hardware."""
+        file_size = os.path.getsize(model_path)
+        hardware = _probe_hardware()
+        n_layers, hidden_dim = _read_gguf_model_shape(model_path)
         
-        # Adjust parameters based on model size
-        if file_size_gb > 10:  # Large models (>10GB)
-            default_params = {
-                'n_gpu_layers': 0,       # Use CPU for very large models to avoid memory issues
-                'n_ctx': 2048,           # Smaller context for large models
-                'n_batch': 256,          # Smaller batch size
-                'n_threads': 6,          # Fewer threads
-                'verbose': False,
-                'use_mmap': True,
-                'use_mlock': False,      # Don't lock memory for large models
-                'f16_kv': True,
-                'logits_all': False,
-            }
-        elif file_size_gb > 5:  # Medium models (5-10GB)
-            default_params = {
-                'n_gpu_layers': 10,      # Partial GPU offload
-                'n_ctx': 3072,           # Medium context
-                'n_batch': 384,          # Medium batch size
-                'n_threads': 8,
-                'verbose': False,
-                'use_mmap': True,
-                'use_mlock': True,
-                'f16_kv': True,
-                'logits_all': False,
-            }
-        else:  # Small models (<5GB)
-            default_params = {
-                'n_gpu_layers': -1,      # Use all GPU layers for small models
-                'n_ctx': 4096,           # Full context
-                'n_batch': 512,          # Full batch size
-                'n_threads': 8,
-                'verbose': False,
-                'use_mmap': True,
-                'use_mlock': True,
-                'f16_kv': True,
-                'logits_all': False,
-            }
+        # Pick parameters that fit up front instead of probing with a failed load
+        default_params = _pick_params(
+            file_size,
+            hardware['free_vram'],
+            hardware['free_ram'],
+            hardware['n_cores'],
+            n_layers=n_layers,
+            hidden_dim=hidden_dim,
+            n_ctx=params.pop('n_ctx', 4096),
+            n_gpu_layers=params.pop('n_gpu_layers', -1),
+            l2_cache_bytes=hardware['l2_cache_bytes'],
+        )
+        
+        # Quantize the KV cache to Q8_0 for GPU-offloaded models to halve the bytes
+        # read per decode step. CPU-only models keep f16 (Q8 KV is slower on AVX2).
+        if default_params['n_gpu_layers'] != 0 and _SUPPORTS_KV_QUANT:
+            default_params.pop('f16_kv')
+            default_params['type_k'] = llama_cpp.GGML_TYPE_Q8_0
+            default_params['type_v'] = llama_cpp.GGML_TYPE_Q8_0
+        
+        if not _SUPPORTS_FLASH_ATTN:
+            default_params.pop('flash_attn')
         
         # Override defaults with provided params
         model_params = {**default_params, **params}
         model_params['model_path'] = model_path
         
-        logger.info(f"Creating optimized model ({file_size_gb:.1f}GB) with params: {model_params}")
+        logger.info(f"Creating optimized model ({file_size / _GB:.1f}GB) with params: {model_params}")
+        logger.info(
+            f"n_gpu_layers={model_params.get('n_gpu_layers')}, "
+            f"flash_attn={model_params.get('flash_attn', False)}, "
+            f"n_batch={model_params.get('n_batch')} "
+            f"(L2 {hardware['l2_cache_bytes'] // 1024}KB, hidden_dim {hidden_dim})"
+        )
         
-        try:
-            return Llama(**model_params)
-        except Exception as e:
-            # Fallback to safer parameters if initial creation fails
-            logger.warning(f"Initial model creation failed: {e}")
-            logger.info("Trying with safer parameters...")
-            
-            fallback_params = {
-                'model_path': model_path,
-                'n_gpu_layers': 0,       # CPU only
-                'n_ctx': 1024,           # Minimal context
-                'n_batch': 128,          # Minimal batch
-                'n_threads': 4,          # Fewer threads
-                'verbose': False,
-                'use_mmap': True,
-                'use_mlock': False,      # Don't lock memory
-                'f16_kv': False,         # Use full precision
-                'logits_all': False,
-            }
-            
-            try:
-                return Llama(**fallback_params)
-            except Exception as fallback_error:
-                logger.error(f"Model creation failed even with fallback parameters: {fallback_error}")
-                raise
+        # Run the model in its own process so a native crash can't take down the server
+        worker = LlamaWorker(model_path, model_params)
+        worker.start()
+        return worker
     
     def _evict_lru_model(self):
         """Remove least recently used model to free memory."""
         if not self.models:
             return
         
-        lru_path = min(self.models.keys(), 
-                      key=lambda path: self.models[path].last_used)
+        lru_path, instance = self.models.popitem(last=False)
         
         logger.info(f"Evicting LRU model: {lru_path}")
         
-        # Cleanup
-        del self.models[lru_path]
+        # Stop the worker process, which releases all of its model memory
+        instance.model.close()
         
         # Force garbage collection
         gc.collect()
@@ -157,6 +344,8 @@ class OptimizedModelPool:
     def clear_all(self):
         """Clear all loaded models."""
         with self.lock:
+            for instance in self.models.values():
+                instance.model.close()
             self.models.clear()
             gc.collect()
             if torch.cuda.is_available():
@@ -182,6 +371,25 @@ class OptimizedModelPool:
 class OptimizedLLMService:
     """Highly optimized LLM service without LangChain overhead."""
     
+    # Read-only generation defaults, copied per request and updated with caller overrides
+    _DEFAULT_GEN_PARAMS = MappingProxyType({
+        'max_tokens': 200,
+        'temperature': 0.7,
+        'top_p': 0.9,
+        'top_k': 40,
+        'repeat_penalty': 1.1,
+        'echo': False,
+    })
+    
+    # Safety limits applied only to the parameters the caller actually supplied
+    _CLAMPS = MappingProxyType({
+        'max_tokens': lambda v: min(v, 1000),
+        'temperature': lambda v: max(0.1, min(v, 2.0)),
+        'top_p': lambda v: max(0.1, min(v, 1.0)),
+        'top_k': lambda v: max(1, min(v, 100)),
+        'repeat_penalty': lambda v: max(1.0, min(v, 1.5)),
+    })
+    
     def __init__(self, config):
         self.config = config
         self.model_pool = OptimizedModelPool(max_models=3)
@@ -257,37 +465,36 @@ class OptimizedLLMService:
         
         try:
             # Get or load model from optimized pool
+            # Load parameters the caller didn't set are chosen from the host hardware
+            load_params = {
+                key: params[key]
+                for key in ('n_gpu_layers', 'n_ctx', 'n_batch')
+                if key in params
+            }
             instance = self.model_pool.get_or_load_model(
                 model_path=model_path,
-                n_gpu_layers=params.get('n_gpu_layers', -1),
-                n_ctx=params.get('n_ctx', 4096),
-                n_batch=params.get('n_batch', 512),
-                temperature=params.get('temperature', 0.7)
+                temperature=params.get('temperature', 0.7),
+                **load_params
             )
             
             # Create prompt efficiently without LangChain
             prompt = self.create_optimized_prompt(question, template)
             
             # Prepare generation parameters with safety limits
-            generation_params = {
-                'max_tokens': min(params.get('max_tokens', 200), 1000),  # Cap max tokens
-                'temperature': max(0.1, min(params.get('temperature', 0.7), 2.0)),  # Safe temperature range
-                'top_p': max(0.1, min(params.get('top_p', 0.9), 1.0)),
-                'top_k': max(1, min(params.get('top_k', 40), 100)),
-                'repeat_penalty': max(1.0, min(params.get('repeat_penalty', 1.1), 1.5)),
-                'echo': False,
-                'stop': params.get('stop', ["</s>", "\n\nQuestion:", "\n\nHuman:", "\n\n"])
-            }
+            generation_params = dict(self._DEFAULT_GEN_PARAMS)
+            generation_params.update(
+                (key, clamp(params[key]))
+                for key, clamp in self._CLAMPS.items()
+                if key in params
+            )
+            generation_params['stop'] = params.get('stop', _DEFAULT_STOP)
             
             logger.info(f"Generating response for: {question[:50]}...")
             
             # Generate with optimal performance and timeout protection
             try:
                 result = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: instance.model(prompt, **generation_params)
-                    ),
+                    instance.model.submit(prompt, **generation_params),
                     timeout=7200.0  # 2 hour timeout (7200 seconds)
                 )
             except asyncio.TimeoutError:
@@ -343,7 +550,18 @@ class OptimizedLLMService:
         """Generate streaming response for real-time output."""
         
         try:
-            instance = self.model_pool.get_or_load_model(model_path, **params)
+            # Model loads and chunk reads block, so they run off the event loop
+            load_params = {
+                key: params[key]
+                for key in ('n_gpu_layers', 'n_ctx', 'n_batch')
+                if key in params
+            }
+            instance = await asyncio.to_thread(
+                self.model_pool.get_or_load_model,
+                model_path,
+                temperature=params.get('temperature', 0.7),
+                **load_params
+            )
             prompt = self.create_optimized_prompt(question, template)
             
             generation_params = {
@@ -356,13 +574,15 @@ class OptimizedLLMService:
             
             stream = instance.model(prompt, **generation_params)
             
-            for output in stream:
+            while True:
+                output = await asyncio.to_thread(next, stream, None)
+                if output is None:
+                    break
                 token = output['choices'][0]['text']
                 yield {
                     "token": token,
                     "finished": output['choices'][0]['finish_reason'] is not None
                 }
-                await asyncio.sleep(0)  # Allow other tasks to run
                 
         except Exception as e:
             yield {"error": str(e), "finished": True}
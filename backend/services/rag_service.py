@@ -6,58 +6,224 @@ import json
 import hashlib
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Union
 from datetime import datetime
 import pickle
 import re
-from collections import Counter
+import shutil
+import heapq
+import threading
+from collections import Counter, OrderedDict
 import math
 from functools import lru_cache
 import time
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 # Document processing with Docling
 from docling.document_converter import DocumentConverter
 from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.datamodel.base_models import InputFormat
+from docling.datamodel.base_models import InputFormat, DocumentStream
 from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
 import PyPDF2
 import docx
 from bs4 import BeautifulSoup
 import markdown
+import xxhash
+
+# Optional hand-tuned SIMD similarity kernels; falls back to NumPy/BLAS
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+# Optional JIT compiler for the TF-IDF embedding kernel; falls back to NumPy
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Optional token-level markdown parser; falls back to rendering HTML and stripping tags
+try:
+    from markdown_it import MarkdownIt
+except ImportError:
+    MarkdownIt = None
 
 logger = logging.getLogger(__name__)
 
+
+def _l2_normalize(vectors: np.ndarray, eps: float = 1e-12, inplace: bool = False) -> np.ndarray:
+    """
+    Scale vectors (1-D or row-wise 2-D) to unit L2 norm; all-zero vectors stay zero.
+    inplace: divide into `vectors` itself (only for freshly built arrays nothing else references)
+    """
+    norms = np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), eps)
+    if inplace:
+        return np.divide(vectors, norms, out=vectors)
+    return vectors / norms
+
+
+def _quantize_i8(vectors: np.ndarray, return_scales: bool = False):
+    """
+    Symmetric per-vector int8 quantization: vector ~= quantized / scale.
+    return_scales: also return the float32 scales (squeezed to one per vector)
+    """
+    max_abs = np.abs(vectors).max(axis=-1, keepdims=True)
+    scales = 127.0 / np.maximum(max_abs, 1e-12)
+    quantized = np.round(vectors * scales).astype(np.int8)
+    if return_scales:
+        return quantized, scales.squeeze(-1).astype(np.float32)
+    return quantized
+
+
+def _i8_dot_scores(matrix_i8: np.ndarray, row_scales: np.ndarray, query: np.ndarray,
+                   block_rows: int = 4096) -> np.ndarray:
+    """
+    Approximate dot products of int8 rows with a float query, de-scaled back to float.
+    Accumulates in int32 a block at a time (int16 would overflow at 768 dims) so the
+    upcast copy stays small; SimSIMD's native int8 kernel is used when available.
+    """
+    query_i8, query_scale = _quantize_i8(query, return_scales=True)
+    if simsimd is not None and len(matrix_i8):
+        # Rows and query are unit-normalized, so cosine of the int8 vectors is the score
+        return 1.0 - np.asarray(simsimd.cdist(query_i8[np.newaxis, :], matrix_i8, metric='cosine'))[0]
+    
+    query_i32 = query_i8.astype(np.int32)
+    scores = np.empty(len(matrix_i8), dtype=np.float32)
+    for start in range(0, len(matrix_i8), block_rows):
+        block = matrix_i8[start:start + block_rows].astype(np.int32)
+        scores[start:start + block_rows] = block @ query_i32
+    return scores / (row_scales * query_scale)
+
+
+def _dot_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot product of every row of matrix with query (cosine for unit-normalized rows)"""
+    if simsimd is not None and len(matrix):
+        return np.asarray(simsimd.cdist(query[np.newaxis, :], matrix, metric='dot'))[0]
+    return matrix @ query
+
+
+# Below this many rows the float32 kernels beat quantizing the query for int8 search
+_I8_SEARCH_MIN_ROWS = 10000
+
+# Queries longer than this (characters) are embedded without going through the embedding cache
+_EMBED_CACHE_MAX_CHARS = 10000
+
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Common words dropped from extracted keywords
+_STOPWORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but',
+    'in', 'with', 'to', 'for', 'of', 'as', 'by', 'that', 'this',
+    'it', 'from', 'be', 'are', 'was', 'were', 'been', 'have', 'has',
+    'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'may', 'might', 'can', 'shall', 'i', 'you', 'he', 'she', 'we',
+    'they', 'what', 'when', 'where', 'who', 'how', 'not', 'no', 'yes'
+})
+
+# Split boundaries for semantic chunking, coarsest first; every level is always applied.
+# Captured lines (headings, list items) are kept whole rather than split further.
+_SPLIT_SEPARATORS = (
+    re.compile(r'\n\s*\n'),                                               # paragraphs
+    re.compile(r'^([ \t]*(?:#{1,6}|[-*\u2022]|\d+[.)])[ \t].*)$', re.MULTILINE),  # headings, list items
+    re.compile(r'(?<=[.!?])\s+'),                                           # sentences
+)
+
+
+def _fsync(f):
+    """Flush a file object through to disk"""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _fsync_dir(dirpath: str):
+    """Make a rename inside dirpath durable (a no-op where directories can't be opened, e.g. Windows)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append_rows(path: str, rows: np.ndarray, committed: int):
+    """
+    Append rows[committed:] to a raw row file, first dropping anything past the committed
+    rows (e.g. left by a crash mid-save). A file holding fewer rows than that (saved
+    before the file existed) is rewritten from the first row.
+    """
+    row_bytes = rows.itemsize * int(np.prod(rows.shape[1:]))
+    with open(path, 'ab') as f:
+        start = committed if f.seek(0, os.SEEK_END) >= committed * row_bytes else 0
+        f.truncate(start * row_bytes)
+        f.write(np.ascontiguousarray(rows[start:]).tobytes())
+        _fsync(f)
+
+
+def _map_rows(path: str, dtype, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+    """Read-only memory map of the first shape[0] rows of a raw row file (None if it holds fewer)"""
+    nbytes = np.dtype(dtype).itemsize * int(np.prod(shape))
+    if not os.path.exists(path) or os.path.getsize(path) < nbytes:
+        return None
+    if nbytes == 0:
+        return np.empty(shape, dtype=dtype)  # mmap can't map an empty range
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+def _write_rows(path: str, rows: np.ndarray):
+    """Write a whole raw row file, replacing it atomically (processes that mapped the old one keep it)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(np.ascontiguousarray(rows).tobytes())
+        _fsync(f)
+    os.replace(tmp_path, path)
+
+
 class TextChunker:
     """Advanced text chunking with overlap and smart splitting"""
     
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = 256, overlap: int = 50, mode: str = 'semantic') -> List[Dict[str, Any]]:
+    def chunk_text(text: Union[str, Iterable[str]], chunk_size: int = 256, overlap: int = 50,
+                   mode: str = 'semantic') -> List[Dict[str, Any]]:
         """
         Split text into smaller chunks with overlap for better retrieval
+        text: a string, or an iterable of text blocks (e.g. PDF pages) consumed lazily
         mode: 'semantic' (default, sentence-based) or 'fixed' (word-based)
         """
         if mode == 'semantic':
             return TextChunker._semantic_chunk(text, chunk_size, overlap)
         else:
+            if not isinstance(text, str):
+                text = '\n'.join(text)
             return TextChunker._fixed_chunk(text, chunk_size, overlap)
     
     @staticmethod
-    def _semantic_chunk(text: str, chunk_size: int, overlap: int) -> List[Dict[str, Any]]:
+    def _semantic_chunk(text: Union[str, Iterable[str]], chunk_size: int, overlap: int) -> List[Dict[str, Any]]:
         """
         Semantic chunking: Split by sentences, group by topic coherence
-        This produces better context-aware chunks
+        This produces better context-aware chunks. Blocks are split as they are
+        consumed, so a streamed document is never held as one string.
         """
         chunks = []
-        sentences = TextChunker._split_sentences(text)
+        blocks = [text] if isinstance(text, str) else text
+        # (sentence, word count) pairs; counts come from the same split that produced the sentence
+        sentences = (
+            piece for block in blocks for piece in TextChunker._split_sentences(block, chunk_size)
+        )
         
         current_chunk = []
+        current_sizes = []  # Word count of each sentence in current_chunk, computed once
         current_size = 0
         chunk_id = 0
+        num_sentences = 0
         
-        for i, sentence in enumerate(sentences):
-            sentence_size = len(sentence.split())
+        for i, (sentence, sentence_size) in enumerate(sentences):
+            num_sentences = i + 1
             
             # If adding this sentence exceeds chunk size, save current chunk
             if current_size + sentence_size > chunk_size and current_chunk:
@@ -76,12 +242,14 @@ class TextChunker:
                 })
                 
                 # Create overlap by keeping last few sentences
-                overlap_sentences = TextChunker._calculate_overlap(current_chunk, overlap)
-                current_chunk = overlap_sentences
-                current_size = sum(len(s.split()) for s in overlap_sentences)
+                keep = TextChunker._calculate_overlap(current_sizes, overlap)
+                current_chunk = current_chunk[len(current_chunk) - keep:]
+                current_sizes = current_sizes[len(current_sizes) - keep:]
+                current_size = sum(current_sizes)
                 chunk_id += 1
             
             current_chunk.append(sentence)
+            current_sizes.append(sentence_size)
             current_size += sentence_size
         
         # Add the last chunk
@@ -92,8 +260,8 @@ class TextChunker:
             chunks.append({
                 'id': chunk_id,
                 'text': chunk_text,
-                'start_sentence': len(sentences) - len(current_chunk),
-                'end_sentence': len(sentences) - 1,
+                'start_sentence': num_sentences - len(current_chunk),
+                'end_sentence': num_sentences - 1,
                 'word_count': current_size,
                 'keywords': keywords
             })
@@ -132,11 +300,30 @@ class TextChunker:
         return chunks
     
     @staticmethod
-    def _split_sentences(text: str) -> List[str]:
-        """Split text into sentences"""
-        # Simple sentence splitting - can be improved with NLTK
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+    def _split_sentences(text: str, max_words: int = None, level: int = 0) -> List[Tuple[str, int]]:
+        """
+        Split text into sentence-sized pieces by recursing through _SPLIT_SEPARATORS
+        (paragraphs, heading/list lines, sentences), so unpunctuated headings and
+        list items become their own pieces. Pieces still longer than max_words
+        are finally split on whitespace. Returns (piece, word count) pairs.
+        """
+        if level == len(_SPLIT_SEPARATORS):
+            words = text.split()
+            if max_words and len(words) > max_words:
+                return [
+                    (' '.join(words[i:i + max_words]), len(words[i:i + max_words]))
+                    for i in range(0, len(words), max_words)
+                ]
+            text = text.strip()
+            return [(text, len(words))] if text else []
+        
+        separator = _SPLIT_SEPARATORS[level]
+        pieces = []
+        for i, part in enumerate(separator.split(text)):
+            # With a capturing separator, odd parts are the captured lines themselves
+            next_level = len(_SPLIT_SEPARATORS) if separator.groups and i % 2 else level + 1
+            pieces.extend(TextChunker._split_sentences(part, max_words, next_level))
+        return pieces
     
     @staticmethod
     def _extract_keywords(text: str, top_n: int = 10) -> List[str]:
@@ -145,22 +332,12 @@ class TextChunker:
         Returns top_n most relevant keywords
         """
         # Tokenize and clean
-        words = re.findall(r'\b\w+\b', text.lower())
-        
-        # Remove common stop words
-        stop_words = {
-            'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but',
-            'in', 'with', 'to', 'for', 'of', 'as', 'by', 'that', 'this',
-            'it', 'from', 'be', 'are', 'was', 'were', 'been', 'have', 'has',
-            'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-            'may', 'might', 'can', 'shall', 'i', 'you', 'he', 'she', 'we',
-            'they', 'what', 'when', 'where', 'who', 'how', 'not', 'no', 'yes'
-        }
+        words = _WORD_RE.findall(text.lower())
         
         # Filter words
         filtered_words = [
             w for w in words 
-            if w not in stop_words and len(w) > 2  # Remove short words
+            if w not in _STOPWORDS and len(w) > 2  # Remove short words
         ]
         
         # Count word frequencies
@@ -172,23 +349,66 @@ class TextChunker:
         return keywords
     
     @staticmethod
-    def _calculate_overlap(sentences: List[str], overlap_size: int) -> List[str]:
-        """Calculate overlap sentences based on word count"""
-        if not sentences or overlap_size <= 0:
-            return []
-        
-        overlap_sentences = []
-        word_count = 0
-        
-        for sentence in reversed(sentences):
-            sentence_words = len(sentence.split())
-            if word_count + sentence_words <= overlap_size:
-                overlap_sentences.insert(0, sentence)
-                word_count += sentence_words
-            else:
-                break
-        
-        return overlap_sentences
+    def _calculate_overlap(sizes: List[int], overlap_size: int) -> int:
+        """
+        Number of trailing sentences to carry over as overlap: the longest tail whose
+        total word count (from the precomputed per-sentence sizes) fits in overlap_size
+        """
+        if not sizes or overlap_size <= 0:
+            return 0
+        tail_sums = np.cumsum(sizes[::-1])
+        return int(np.searchsorted(tail_sums, overlap_size, side='right'))
+
+
+def _tfidf_rows_sparse(offsets, word_ids, counts, doc_lengths, idf, projection):
+    """
+    Build L2-normalized hashed TF-IDF rows as one sparse product:
+    a CSR (rows x vocabulary) TF-IDF matrix times the (vocabulary x dim) hashing projection
+    """
+    n_rows = len(offsets) - 1
+    rows = np.repeat(np.arange(n_rows), np.diff(offsets))
+    tfidf = sparse.csr_matrix(
+        (counts * idf[word_ids] / doc_lengths[rows], word_ids, offsets),
+        shape=(n_rows, len(idf))
+    )
+    out = (tfidf @ projection).toarray().astype(np.float32, copy=False)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return np.divide(out, norms, out=out, where=norms > 0)
+
+
+def _tfidf_rows_loop(offsets, word_ids, counts, doc_lengths, idf, positions, signs, dim):
+    """Loop form of _tfidf_rows_sparse, compiled with Numba and parallel across rows"""
+    n_rows = len(offsets) - 1
+    out = np.zeros((n_rows, dim), dtype=np.float32)
+    for row in prange(n_rows):
+        for j in range(offsets[row], offsets[row + 1]):
+            word = word_ids[j]
+            out[row, positions[word]] += signs[word] * counts[j] * idf[word] / doc_lengths[row]
+        norm = 0.0
+        for d in range(dim):
+            norm += out[row, d] * out[row, d]
+        if norm > 0:
+            norm = math.sqrt(norm)
+            for d in range(dim):
+                out[row, d] /= norm
+    return out
+
+
+# cache=True keeps the compiled kernel on disk, so later processes skip recompiling it
+_tfidf_rows_jit = njit(parallel=True, fastmath=True, cache=True)(_tfidf_rows_loop) if njit is not None else None
+
+
+# Word -> integer hash used for embedding positions. Stores keep the scheme they were
+# built with (vectors from different schemes aren't comparable); new stores use xxh64-signed.
+_POSITION_HASHES = {
+    'md5': lambda word: int(hashlib.md5(word.encode()).hexdigest(), 16),
+    'xxh64': xxhash.xxh64_intdigest,
+    'xxh64-signed': xxhash.xxh64_intdigest,
+}
+
+# Schemes that also take a +/-1 sign per word from the hash's top bit (a sparse random
+# projection), so words colliding on a position cancel out in expectation instead of adding up
+_SIGNED_POSITION_HASHES = frozenset({'xxh64-signed'})
 
 
 class SimpleEmbedder:
@@ -196,150 +416,469 @@ class SimpleEmbedder:
     
     def __init__(self):
         self.vocabulary = {}
-        self.idf_values = {}
+        # Running corpus statistics, so IDF can be updated without refitting
+        self.doc_freq = np.zeros(0, dtype=np.int64)  # Document frequency per vocabulary id
+        self.num_docs = 0
         self.dimension = 768  # Standard embedding dimension
+        self.position_hash = 'xxh64-signed'  # Key into _POSITION_HASHES
+        # Vocabulary-id indexed lookup arrays for the vectorized embedding kernel
+        self._idf_array = np.zeros(0)
+        self._position_array = np.zeros(0, dtype=np.int64)
+        self._sign_array = np.zeros(0)
+        self._projection = sparse.csr_matrix((0, self.dimension))
+        
+    def __setstate__(self, state):
+        """Restore pickled embedders, building lookup arrays for ones saved before they existed"""
+        self.__dict__.update(state)
+        if 'position_hash' not in state:
+            # Embedders pickled before the scheme was recorded hashed with md5
+            self.position_hash = 'md5'
+        if 'doc_freq' not in state:
+            # Counts are restored by the owning VectorStore from its postings
+            self.doc_freq = np.zeros(len(self.vocabulary), dtype=np.int64)
+            self.num_docs = 0
+        elif isinstance(self.doc_freq, dict):
+            # Counts used to be kept in a word -> count Counter
+            words = sorted(self.vocabulary, key=self.vocabulary.get)
+            self.doc_freq = np.array([self.doc_freq.get(word, 0) for word in words], dtype=np.int64)
+        if '_sign_array' not in state:
+            words = sorted(self.vocabulary, key=self.vocabulary.get)
+            idf_values = state.get('idf_values', {})
+            self._idf_array = np.array([idf_values.get(word, 1.0) for word in words], dtype=np.float64)
+            self._position_array = np.zeros(0, dtype=np.int64)
+            self._sign_array = np.zeros(0)
+            self._build_lookup_arrays()
+        self.__dict__.pop('idf_values', None)
+    
+    def _hash_position(self, word: str) -> Tuple[int, int]:
+        """Map a word to its position in the embedding vector and the sign it is added with"""
+        hash_val = _POSITION_HASHES[self.position_hash](word)
+        if self.position_hash in _SIGNED_POSITION_HASHES and hash_val >> 63:
+            return hash_val % self.dimension, -1
+        return hash_val % self.dimension, 1
+    
+    def _build_lookup_arrays(self):
+        """Precompute per-vocabulary-id hashed positions and the projection built from them"""
+        words = sorted(self.vocabulary, key=self.vocabulary.get)
+        # Positions depend only on the word, so only words added since the last build are hashed
+        new_positions = [self._hash_position(word) for word in words[len(self._position_array):]]
+        new_positions = np.array(new_positions, dtype=np.int64).reshape(-1, 2)
+        self._position_array = np.concatenate([self._position_array, new_positions[:, 0]])
+        self._sign_array = np.concatenate([self._sign_array, new_positions[:, 1].astype(np.float64)])
+        # Feature-hashing projection: vocabulary id -> its (signed) hashed embedding position
+        self._projection = sparse.csr_matrix(
+            (self._sign_array, (np.arange(len(words)), self._position_array)),
+            shape=(len(words), self.dimension)
+        )
+    
+    def fit(self, documents: List[str], tokens: List[List[str]] = None):
+        """Build vocabulary and calculate IDF values from scratch (tokens: optional pre-tokenized documents)"""
+        self.vocabulary = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.num_docs = 0
+        self._position_array = np.zeros(0, dtype=np.int64)
+        self._sign_array = np.zeros(0)
+        self.update(documents, tokens)
+    
+    def update(self, documents: List[str], tokens: List[List[str]] = None):
+        """
+        Add documents to the running document frequencies, appending unseen words
+        to the vocabulary and refreshing IDF values for the whole corpus
+        """
+        if tokens is None:
+            tokens = [self._tokenize(doc) for doc in documents]
         
-    def fit(self, documents: List[str]):
-        """Build vocabulary and calculate IDF values"""
-        # Build vocabulary
-        all_words = []
-        doc_word_counts = []
-        
-        for doc in documents:
-            words = self._tokenize(doc)
-            word_counts = Counter(words)
-            doc_word_counts.append(word_counts)
-            all_words.extend(set(words))
-        
-        # Create vocabulary index
-        unique_words = list(set(all_words))
-        self.vocabulary = {word: idx for idx, word in enumerate(unique_words)}
-        
-        # Calculate IDF values
-        num_docs = len(documents)
-        for word in self.vocabulary:
-            doc_count = sum(1 for doc_counts in doc_word_counts if word in doc_counts)
-            self.idf_values[word] = math.log((num_docs + 1) / (doc_count + 1)) + 1
+        # Vocabulary id of every (document, distinct word) pair, counted in one bincount
+        seen_ids = []
+        for words in tokens:
+            for word in set(words):
+                word_id = self.vocabulary.get(word)
+                if word_id is None:
+                    word_id = self.vocabulary[word] = len(self.vocabulary)
+                seen_ids.append(word_id)
+        self.num_docs += len(tokens)
+        
+        new_counts = np.bincount(np.array(seen_ids, dtype=np.int64), minlength=len(self.vocabulary))
+        new_counts[:len(self.doc_freq)] += self.doc_freq
+        self.doc_freq = new_counts
+        self._refresh_idf()
+    
+    def restore_counts(self, doc_freq: Dict[str, int], num_docs: int):
+        """Replace the running corpus statistics (e.g. rebuilt from a keyword index) and refresh IDF"""
+        for word in doc_freq:
+            if word not in self.vocabulary:
+                self.vocabulary[word] = len(self.vocabulary)
+        self.doc_freq = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for word, count in doc_freq.items():
+            self.doc_freq[self.vocabulary[word]] = count
+        self.num_docs = num_docs
+        self._refresh_idf()
+    
+    def _refresh_idf(self):
+        """Recompute smoothed IDF for every vocabulary word from the running counts"""
+        self._idf_array = np.log((self.num_docs + 1) / (self.doc_freq + 1.0)) + 1
+        self._build_lookup_arrays()
+    
+    def word_idf(self, word: str) -> float:
+        """IDF weight of a word (1.0 for words outside the vocabulary)"""
+        word_id = self.vocabulary.get(word)
+        return float(self._idf_array[word_id]) if word_id is not None else 1.0
     
     def embed(self, text: str) -> np.ndarray:
         """Create embedding for text"""
-        words = self._tokenize(text)
-        word_counts = Counter(words)
-        
-        # Create TF-IDF vector
-        vector = np.zeros(self.dimension)
-        
-        for word, count in word_counts.items():
-            if word in self.vocabulary:
-                # TF-IDF score
-                tf = count / len(words)
-                idf = self.idf_values.get(word, 1.0)
-                score = tf * idf
-                
-                # Hash word to get position in vector
-                hash_val = int(hashlib.md5(word.encode()).hexdigest(), 16)
-                position = hash_val % self.dimension
-                vector[position] += score
-        
-        # Normalize vector
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = vector / norm
-        
-        return vector
+        return self.embed_batch([text])[0]
+    
+    def embed_batch(self, texts: List[str], tokens: List[List[str]] = None) -> np.ndarray:
+        """Create embeddings for many texts at once, one row per text (tokens: optional pre-tokenized texts)"""
+        if tokens is None:
+            tokens = [self._tokenize(text) for text in texts]
+        
+        offsets = [0]
+        word_ids = []
+        counts = []
+        doc_lengths = []
+        
+        # Tokenize and map to vocabulary ids in Python; the numeric work runs in the kernel
+        for words in tokens:
+            for word, count in Counter(words).items():
+                word_id = self.vocabulary.get(word)
+                if word_id is not None:
+                    word_ids.append(word_id)
+                    counts.append(count)
+            offsets.append(len(word_ids))
+            doc_lengths.append(max(len(words), 1))
+        
+        offsets = np.array(offsets, dtype=np.int64)
+        word_ids = np.array(word_ids, dtype=np.int64)
+        counts = np.array(counts, dtype=np.float64)
+        doc_lengths = np.array(doc_lengths, dtype=np.float64)
+        
+        if _tfidf_rows_jit is not None:
+            return _tfidf_rows_jit(
+                offsets, word_ids, counts, doc_lengths,
+                self._idf_array, self._position_array, self._sign_array, self.dimension
+            )
+        return _tfidf_rows_sparse(offsets, word_ids, counts, doc_lengths, self._idf_array, self._projection)
     
-    def _tokenize(self, text: str) -> List[str]:
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
         """Simple tokenization"""
-        text = text.lower()
-        words = re.findall(r'\b\w+\b', text)
-        return words
+        return _WORD_RE.findall(text.lower())
 
 
 class VectorStore:
-    """Simple in-memory vector store with hybrid search and caching"""
+    """
+    Simple in-memory vector store with hybrid search and caching
+    
+    Invariant: every row of _matrix (and every query vector) is unit-normalized,
+    so cosine similarity is a plain dot product. Indexes persist through
+    append_pending/load_appended; stores pickled by earlier versions keep the raw
+    vectors and rebuild _matrix through _rebuild_matrix, which re-applies normalization.
+    """
     
-    def __init__(self, embedding_dim: int = 768, enable_cache: bool = True, cache_size: int = 100):
+    def __init__(self, embedding_dim: int = 768, enable_cache: bool = True, cache_size: int = 100,
+                 vector_dtype: str = 'float32'):
         self.embedding_dim = embedding_dim
-        self.vectors = []
+        # 'float32': search the float32 matrix (int8 only for large stores with SimSIMD);
+        # 'int8': always search the int8 matrix, 4x less memory traffic at some precision cost
+        self.vector_dtype = vector_dtype
+        # Contiguous (N, dim) float32 unit-normalized embeddings for single-call similarity search
+        self._matrix = np.empty((0, embedding_dim), dtype=np.float32)
+        # int8 quantized copy of _matrix and its per-row scales (row ~= quantized / scale)
+        self._matrix_i8 = np.empty((0, embedding_dim), dtype=np.int8)
+        self._matrix_scales = np.empty(0, dtype=np.float32)
+        # Over-allocated backing arrays that the matrices are views of (None: no spare rows)
+        self._matrix_buffer = None
+        self._matrix_i8_buffer = None
+        self._matrix_scales_buffer = None
         self.metadata = []
-        self.text_index = {}  # For keyword search
+        self.text_index = {}  # For keyword search: word -> int32 array of doc ids (postings)
+        # Same layout for chunk metadata keywords; built lazily by _sync_keyword_index
+        self._keyword_index = None
+        self._keyword_index_rows = 0
+        # document_id -> int32 array of its chunk rows; built lazily by _sync_document_index
+        self._document_index = None
+        self._document_index_rows = 0
         self.embedder = SimpleEmbedder()
         
         # Performance optimizations
         self.enable_cache = enable_cache
         self.cache_size = cache_size
-        self._query_cache = {}  # Cache for query results
-        self._embedding_cache = {}  # Cache for query embeddings (NEW)
+        self._query_cache = OrderedDict()  # LRU cache for query results
+        self._embedding_cache = OrderedDict()  # LRU cache for query embeddings
+        # Guards both LRU caches; concurrent queries reorder and evict entries
+        self._cache_lock = threading.Lock()
         self._last_query_time = {}  # Track query times for timeout
+        # (rows, chunk bytes) already written by append_pending
+        self._persisted = (0, 0)
         
     def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]] = None):
         """Add documents to the vector store"""
         if metadatas is None:
-            metadatas = [{}] * len(texts)
+            metadatas = [{} for _ in texts]
         
-        # Fit embedder on all texts
-        self.embedder.fit(texts)
+        # Tokenize once; fitting, embedding and the keyword index all reuse it
+        tokens = [self.embedder._tokenize(text) for text in texts]
         
-        for text, metadata in zip(texts, metadatas):
-            # Create embedding
-            embedding = self.embedder.embed(text)
-            
-            # Store vector and metadata
-            doc_id = len(self.vectors)
-            self.vectors.append(embedding)
-            
+        # Fold the new texts into the corpus statistics (earlier documents keep their vocabulary)
+        self.embedder.update(texts, tokens)
+        
+        # Embed the whole batch in one kernel call
+        embeddings = self.embedder.embed_batch(texts, tokens)
+        
+        first_doc_id = len(self.metadata)
+        for doc_id, (text, metadata) in enumerate(zip(texts, metadatas), start=first_doc_id):
             # Store metadata with text
             metadata['text'] = text
             metadata['doc_id'] = doc_id
             self.metadata.append(metadata)
-            
-            # Build text index for keyword search
-            words = self.embedder._tokenize(text)
-            for word in set(words):
-                if word not in self.text_index:
-                    self.text_index[word] = []
-                self.text_index[word].append(doc_id)
+        
+        # Build text index for keyword search
+        self._add_postings(self.text_index, tokens, first_doc_id)
+        
+        # Append the new rows to the search matrix
+        new_rows = _l2_normalize(np.array(embeddings, dtype=np.float32).reshape(-1, self.embedding_dim), inplace=True)
+        if len(new_rows):
+            self._append_matrix_rows(new_rows)
         
         # Clear cache when new documents are added
-        self._query_cache.clear()
+        with self._cache_lock:
+            self._query_cache.clear()
     
-    def search(self, query: str, k: int = 5, mode: str = 'hybrid', min_score: float = 0.0, timeout: float = None) -> List[Tuple[Dict, float]]:
+    def _append_matrix_rows(self, new_rows: np.ndarray):
+        """
+        Append unit-normalized rows to _matrix and _matrix_i8, doubling the backing
+        buffers when full so a series of uploads copies existing rows O(1) times amortized
+        """
+        n_rows = len(self._matrix)
+        needed = n_rows + len(new_rows)
+        if self._matrix_buffer is None or needed > len(self._matrix_buffer):
+            capacity = max(needed, 2 * n_rows, 64)
+            self._matrix_buffer = np.empty((capacity, self.embedding_dim), dtype=np.float32)
+            self._matrix_buffer[:n_rows] = self._matrix
+            self._matrix_i8_buffer = np.empty((capacity, self.embedding_dim), dtype=np.int8)
+            self._matrix_i8_buffer[:n_rows] = self._matrix_i8
+            self._matrix_scales_buffer = np.empty(capacity, dtype=np.float32)
+            self._matrix_scales_buffer[:n_rows] = self._matrix_scales
+        
+        self._matrix_buffer[n_rows:needed] = new_rows
+        self._matrix_i8_buffer[n_rows:needed], self._matrix_scales_buffer[n_rows:needed] = \
+            _quantize_i8(new_rows, return_scales=True)
+        self._matrix = self._matrix_buffer[:needed]
+        self._matrix_i8 = self._matrix_i8_buffer[:needed]
+        self._matrix_scales = self._matrix_scales_buffer[:needed]
+    
+    def _set_matrix(self, matrix: np.ndarray):
+        """Install a unit-normalized float32 matrix exactly sized (no spare rows) and quantize it"""
+        self._matrix = matrix
+        quantized, scales = _quantize_i8(matrix, return_scales=True)
+        self._matrix_i8 = np.ascontiguousarray(quantized)
+        self._matrix_scales = scales
+        self._matrix_buffer = self._matrix_i8_buffer = self._matrix_scales_buffer = None
+    
+    @staticmethod
+    def _add_postings(index: Dict[str, np.ndarray], tokens: List[List[str]], first_doc_id: int):
+        """Append postings for consecutive doc ids to index's int32 arrays, one copy per word"""
+        new_postings = {}
+        for doc_id, words in enumerate(tokens, start=first_doc_id):
+            for word in set(words):
+                new_postings.setdefault(word, []).append(doc_id)
+        
+        for word, doc_ids in new_postings.items():
+            doc_ids = np.array(doc_ids, dtype=np.int32)
+            existing = index.get(word)
+            index[word] = doc_ids if existing is None else np.concatenate([existing, doc_ids])
+    
+    def _sync_keyword_index(self):
+        """Add postings for chunk metadata keywords of documents indexed since the last sync"""
+        if self._keyword_index is None:
+            self._keyword_index = {}
+            self._keyword_index_rows = 0
+        if self._keyword_index_rows < len(self.metadata):
+            self._add_postings(
+                self._keyword_index,
+                [metadata.get('keywords', []) for metadata in self.metadata[self._keyword_index_rows:]],
+                self._keyword_index_rows
+            )
+            self._keyword_index_rows = len(self.metadata)
+    
+    def _sync_document_index(self):
+        """Add chunk rows of documents indexed since the last sync to the document index"""
+        if self._document_index is None:
+            self._document_index = {}
+            self._document_index_rows = 0
+        if self._document_index_rows < len(self.metadata):
+            self._add_postings(
+                self._document_index,
+                [[metadata.get('document_id')] for metadata in self.metadata[self._document_index_rows:]],
+                self._document_index_rows
+            )
+            self._document_index_rows = len(self.metadata)
+    
+    def document_rows(self, document_id: str) -> np.ndarray:
+        """Row indices (into metadata/vectors) of every chunk of a document"""
+        self._sync_document_index()
+        return self._document_index.get(document_id, np.empty(0, dtype=np.int32))
+    
+    def append_pending(self, dirpath: str) -> Tuple[int, int]:
+        """
+        Append rows added since the last commit to dirpath/vectors.f32 (raw float32), their
+        int8 copy and scales to dirpath/vectors.i8 and dirpath/scales.f32, and their metadata
+        to dirpath/chunks.jsonl. Returns the (rows, chunk bytes) sizes to record in the
+        caller's manifest, which then calls commit_persisted with them.
+        """
+        rows, chunk_bytes = self._persisted
+        
+        for name, matrix in (('vectors.f32', self._matrix), ('vectors.i8', self._matrix_i8),
+                             ('scales.f32', self._matrix_scales)):
+            _append_rows(os.path.join(dirpath, name), matrix, rows)
+        
+        with open(os.path.join(dirpath, 'chunks.jsonl'), 'ab') as f:
+            f.truncate(chunk_bytes)
+            for metadata in self.metadata[rows:]:
+                f.write((json.dumps(metadata, default=str) + '\n').encode('utf-8'))
+            chunk_bytes = f.tell()
+            _fsync(f)
+        
+        return len(self.metadata), chunk_bytes
+    
+    def commit_persisted(self, persisted: Tuple[int, int]):
+        """Record sizes returned by append_pending once the manifest referencing them is written"""
+        self._persisted = tuple(persisted)
+    
+    def load_appended(self, dirpath: str, rows: int, chunk_bytes: int, position_hash: str):
+        """
+        Restore from the append-only files, reading only the committed rows and bytes.
+        The float32 rows, int8 rows and scales are memory-mapped (pages fault in on search
+        and are shared across processes); keyword postings and corpus statistics are
+        rebuilt from the chunk text.
+        """
+        matrix = _map_rows(os.path.join(dirpath, 'vectors.f32'), np.float32, (rows, self.embedding_dim))
+        if matrix is None:
+            raise ValueError(f"{dirpath}: vectors.f32 holds fewer than the {rows} committed rows")
+        quantized = _map_rows(os.path.join(dirpath, 'vectors.i8'), np.int8, (rows, self.embedding_dim))
+        scales = _map_rows(os.path.join(dirpath, 'scales.f32'), np.float32, (rows,))
+        if quantized is None or scales is None:
+            # Saved before the int8 copy was persisted: quantize once and write it alongside
+            quantized, scales = _quantize_i8(matrix, return_scales=True)
+            try:
+                _write_rows(os.path.join(dirpath, 'vectors.i8'), quantized)
+                _write_rows(os.path.join(dirpath, 'scales.f32'), scales)
+            except OSError as e:
+                logger.warning(f"Could not save the int8 vectors of {dirpath}: {e}")
+        self._matrix, self._matrix_i8, self._matrix_scales = matrix, quantized, scales
+        self._matrix_buffer = self._matrix_i8_buffer = self._matrix_scales_buffer = None
+        
+        with open(os.path.join(dirpath, 'chunks.jsonl'), 'rb') as f:
+            lines = f.read(chunk_bytes).decode('utf-8').splitlines()
+        self.metadata = [json.loads(line) for line in lines]
+        
+        texts = [metadata['text'] for metadata in self.metadata]
+        tokens = [self.embedder._tokenize(text) for text in texts]
+        self.embedder = SimpleEmbedder()
+        self.embedder.position_hash = position_hash
+        self.embedder.update(texts, tokens)
+        self.text_index = {}
+        self._add_postings(self.text_index, tokens, 0)
+        self._keyword_index = None
+        self._document_index = None
+        
+        self._persisted = (rows, chunk_bytes)
+        with self._cache_lock:
+            self._query_cache.clear()
+            self._embedding_cache.clear()
+    
+    def __getstate__(self):
+        # Pickle the matrices at their used size, not the spare buffer capacity
+        state = self.__dict__.copy()
+        state['_matrix_buffer'] = state['_matrix_i8_buffer'] = state['_matrix_scales_buffer'] = None
+        del state['_cache_lock']
+        return state
+    
+    def __setstate__(self, state):
+        """Restore pickled stores, rebuilding the search matrix for indexes saved before it existed"""
+        # Earlier versions also kept every raw embedding in a 'vectors' list
+        state = dict(state)
+        vectors = state.pop('vectors', None)
+        self.__dict__.update(state)
+        if 'vector_dtype' not in state:
+            self.vector_dtype = 'float32'
+        if '_matrix_scales' not in state:
+            self._rebuild_matrix(vectors)
+        if '_persisted' not in state:
+            self._persisted = (0, 0)
+        if '_keyword_index' not in state:
+            self._keyword_index = None
+            self._keyword_index_rows = 0
+        if '_document_index' not in state:
+            self._document_index = None
+            self._document_index_rows = 0
+        self._query_cache = OrderedDict(self._query_cache)
+        self._embedding_cache = OrderedDict(self._embedding_cache)
+        self._cache_lock = threading.Lock()
+        self._compact_text_index()
+        self._restore_embedder_counts()
+    
+    def _restore_embedder_counts(self):
+        """
+        Older indexes refit the embedder on each upload, so its vocabulary and IDF only
+        covered the last batch; rebuild corpus-wide counts from the keyword postings
+        """
+        if self.embedder.num_docs == 0 and self.metadata:
+            self.embedder.restore_counts(
+                {word: len(doc_ids) for word, doc_ids in self.text_index.items()},
+                len(self.metadata)
+            )
+    
+    def _compact_text_index(self):
+        """Convert postings saved as Python lists (older indexes) to int32 arrays"""
+        for word, doc_ids in self.text_index.items():
+            if not isinstance(doc_ids, np.ndarray):
+                self.text_index[word] = np.array(doc_ids, dtype=np.int32)
+    
+    def _rebuild_matrix(self, vectors: List[np.ndarray]):
+        """Rebuild the contiguous search matrix from raw embeddings"""
+        self._set_matrix(np.ascontiguousarray(_l2_normalize(
+            np.array(vectors, dtype=np.float32).reshape(-1, self.embedding_dim), inplace=True
+        )))
+    
+    def search(self, query: str, k: int = 5, mode: str = 'hybrid', min_score: float = 0.0, timeout: float = None,
+               tokens: List[str] = None) -> List[Tuple[Dict, float]]:
         """
         Search for similar documents with caching and timeout
         mode: 'vector', 'keyword', or 'hybrid'
         min_score: Minimum relevance score to include in results
         timeout: Maximum time in seconds for search operation
+        tokens: Optional pre-tokenized query (e.g. shared across several stores)
         """
-        start_time = time.time()
+        start_time = time.monotonic()
         
         # Check cache
         cache_key = f"{query}_{k}_{mode}_{min_score}"
-        if self.enable_cache and cache_key in self._query_cache:
-            logger.debug(f"Cache hit for query: {query[:50]}...")
-            return self._query_cache[cache_key]
+        if self.enable_cache:
+            cached = self._cache_get(self._query_cache, cache_key)
+            if cached is not None:
+                logger.debug(f"Cache hit for query: {query[:50]}...")
+                return cached
         
         # Perform search based on mode
         try:
             if mode == 'vector':
-                results = self._vector_search(query, k, timeout)
+                results = self._vector_search(query, k, timeout, tokens)
             elif mode == 'keyword':
-                results = self._keyword_search(query, k, timeout)
+                results = self._keyword_search(query, k, timeout, tokens)
             else:  # hybrid
-                results = self._hybrid_search(query, k, timeout)
+                results = self._hybrid_search(query, k, timeout, tokens, min_score)
             
             # Filter by minimum score
             if min_score > 0:
                 results = [(metadata, score) for metadata, score in results if score >= min_score]
             
-            # Cache results (with size limit)
+            # Cache results, evicting the least recently used
             if self.enable_cache:
-                if len(self._query_cache) >= self.cache_size:
-                    # Remove oldest entry (simple FIFO)
-                    oldest_key = next(iter(self._query_cache))
-                    del self._query_cache[oldest_key]
-                self._query_cache[cache_key] = results
+                self._cache_put(self._query_cache, cache_key, results)
             
-            query_time = time.time() - start_time
+            query_time = time.monotonic() - start_time
             logger.debug(f"RAG search completed in {query_time:.3f}s, found {len(results)} results")
             
             return results
@@ -353,187 +892,203 @@ class VectorStore:
     
     def _check_timeout(self, start_time: float, timeout: float):
         """Check if operation has exceeded timeout"""
-        if timeout and (time.time() - start_time) > timeout:
+        if timeout and (time.monotonic() - start_time) > timeout:
             raise TimeoutError(f"Operation exceeded timeout of {timeout}s")
     
-    def _vector_search(self, query: str, k: int, timeout: float = None) -> List[Tuple[Dict, float]]:
+    def _vector_search(self, query: str, k: int, timeout: float = None,
+                       tokens: List[str] = None) -> List[Tuple[Dict, float]]:
         """Vector similarity search with timeout protection and embedding caching"""
-        start_time = time.time()
+        start_time = time.monotonic()
         
-        if not self.vectors:
+        if not self.metadata:
             return []
         
-        # Check embedding cache first
-        if self.enable_cache and query in self._embedding_cache:
-            query_embedding = self._embedding_cache[query]
-            logger.debug(f"Embedding cache hit for query: {query[:50]}...")
-        else:
-            query_embedding = self.embedder.embed(query)
-            # Cache the embedding
-            if self.enable_cache:
-                if len(self._embedding_cache) >= self.cache_size:
-                    # Remove oldest entry (simple FIFO)
-                    oldest_key = next(iter(self._embedding_cache))
-                    del self._embedding_cache[oldest_key]
-                self._embedding_cache[query] = query_embedding
-        
-        self._check_timeout(start_time, timeout)
-        
-        # Calculate cosine similarities
-        similarities = []
-        for i, vec in enumerate(self.vectors):
-            if i % 100 == 0:  # Check timeout periodically
-                self._check_timeout(start_time, timeout)
-            similarity = np.dot(query_embedding, vec)
-            similarities.append((i, similarity))
-        
-        # Sort by similarity
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top k results
-        results = []
-        for doc_id, score in similarities[:k]:
-            results.append((self.metadata[doc_id], score))
-        
-        return results
+        scores = self._vector_scores(query, start_time, timeout, tokens)
+        return self._top_k(scores, k)
     
-    def _keyword_search(self, query: str, k: int, timeout: float = None) -> List[Tuple[Dict, float]]:
+    def _keyword_search(self, query: str, k: int, timeout: float = None,
+                        tokens: List[str] = None) -> List[Tuple[Dict, float]]:
         """Keyword-based search with enhanced keyword matching and timeout"""
-        start_time = time.time()
-        
-        query_words = set(self.embedder._tokenize(query))
-        self._check_timeout(start_time, timeout)
+        start_time = time.monotonic()
         
-        # Score documents based on keyword matches
-        doc_scores = Counter()
-        for word in query_words:
-            if word in self.text_index:
-                for doc_id in self.text_index[word]:
-                    doc_scores[doc_id] += 1
+        scores = self._keyword_scores(query, start_time, timeout, tokens)
+        # Only documents with at least one match are candidates
+        return self._top_k(scores, k, candidates=np.flatnonzero(scores))
+    
+    def _hybrid_search(self, query: str, k: int, timeout: float = None,
+                       tokens: List[str] = None, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        """
+        Combine vector and keyword scores for every document in one pass, with timeout
+        min_score: skip keyword scoring when no document can reach it
+        """
+        start_time = time.monotonic()
         
-        self._check_timeout(start_time, timeout)
+        if not self.metadata:
+            return []
         
-        # Boost scores for documents with matching metadata keywords
-        for doc_id, metadata in enumerate(self.metadata):
-            if 'keywords' in metadata:
-                doc_keywords = set(metadata['keywords'])
-                keyword_matches = len(query_words & doc_keywords)
-                if keyword_matches > 0:
-                    # Boost score for keyword matches
-                    doc_scores[doc_id] += keyword_matches * 2
+        # Tokenize once for both the query embedding and keyword matching
+        if tokens is None:
+            tokens = self.embedder._tokenize(query)
+        vector_scores = self._vector_scores(query, start_time, timeout, tokens)
         
-        # Normalize scores
-        max_score = max(doc_scores.values()) if doc_scores else 1
+        # Keyword scores are normalized to at most 1, so this bounds every combined score
+        if min_score > 0 and 0.7 * vector_scores.max() + 0.3 < min_score:
+            return []
         
-        # Get top k results
-        top_docs = doc_scores.most_common(k)
-        results = []
-        for doc_id, count in top_docs:
-            score = count / max_score
-            results.append((self.metadata[doc_id], score))
+        keyword_scores = self._keyword_scores(query, start_time, timeout, tokens)
         
-        return results
+        # Vector similarity 70%, keyword match 30%
+        combined = 0.7 * vector_scores + 0.3 * keyword_scores
+        return self._top_k(combined, k)
     
-    def _hybrid_search(self, query: str, k: int, timeout: float = None) -> List[Tuple[Dict, float]]:
-        """Combine vector and keyword search with timeout"""
-        start_time = time.time()
+    def _query_embedding(self, query: str, tokens: List[str] = None) -> np.ndarray:
+        """Embed a query, using the embedding cache when enabled (tokens: optional pre-tokenized query)"""
+        use_cache = self.enable_cache and len(query) <= _EMBED_CACHE_MAX_CHARS
+        if use_cache:
+            cached = self._cache_get(self._embedding_cache, query)
+            if cached is not None:
+                logger.debug(f"Embedding cache hit for query: {query[:50]}...")
+                return cached
+        
+        query_embedding = self.embedder.embed_batch([query], None if tokens is None else [tokens])[0]
+        # Cache the embedding, evicting the least recently used
+        if use_cache:
+            self._cache_put(self._embedding_cache, query, query_embedding)
+        return query_embedding
+    
+    def _cache_get(self, cache: OrderedDict, key: str) -> Any:
+        """Cached value for key (None if missing), marked most recently used"""
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+    
+    def _cache_put(self, cache: OrderedDict, key: str, value: Any):
+        """Cache a value, evicting the least recently used entry when full"""
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+    
+    def _vector_scores(self, query: str, start_time: float, timeout: float = None,
+                       tokens: List[str] = None) -> np.ndarray:
+        """Cosine similarity of the query against every stored document"""
+        query_embedding = self._query_embedding(query, tokens)
+        self._check_timeout(start_time, timeout)
         
-        # Get results from both methods (get more to ensure good final results)
-        remaining_time = timeout - (time.time() - start_time) if timeout else None
-        vector_results = self._vector_search(query, k * 2, remaining_time)
+        # Cosine similarities for all documents in one matrix-vector product
+        # (rows and query are unit-normalized, so the dot product is the cosine)
+        query_vec = np.ascontiguousarray(_l2_normalize(np.asarray(query_embedding, dtype=np.float32)))
+        if self.vector_dtype == 'int8' or (simsimd is not None and len(self._matrix_i8) >= _I8_SEARCH_MIN_ROWS):
+            # int8 rows move 4x fewer bytes than float32
+            scores = _i8_dot_scores(self._matrix_i8, self._matrix_scales, query_vec)
+        else:
+            scores = _dot_scores(self._matrix, query_vec)
         
         self._check_timeout(start_time, timeout)
+        return np.asarray(scores, dtype=np.float64)
+    
+    def _keyword_scores(self, query: str, start_time: float, timeout: float = None,
+                        tokens: List[str] = None) -> np.ndarray:
+        """Keyword match score for every stored document, normalized so the best match is 1"""
+        query_words = set(self.embedder._tokenize(query) if tokens is None else tokens)
+        self._check_timeout(start_time, timeout)
         
-        remaining_time = timeout - (time.time() - start_time) if timeout else None
-        keyword_results = self._keyword_search(query, k * 2, remaining_time)
-        
-        # Combine scores
-        combined_scores = {}
+        # Score documents by the IDF of each matched query term, one scatter-add per term
+        # (postings hold each doc id at most once, so fancy-index += is exact)
+        doc_scores = np.zeros(len(self.metadata), dtype=np.float64)
+        for word in query_words:
+            postings = self.text_index.get(word)
+            if postings is not None:
+                doc_scores[postings] += self.embedder.word_idf(word)
         
-        # Add vector search results (70% weight)
-        for metadata, score in vector_results:
-            doc_id = metadata['doc_id']
-            combined_scores[doc_id] = {
-                'metadata': metadata,
-                'vector_score': score,
-                'keyword_score': 0,
-                'combined_score': score * 0.7
-            }
+        self._check_timeout(start_time, timeout)
         
-        # Add keyword search results (30% weight)
-        for metadata, score in keyword_results:
-            doc_id = metadata['doc_id']
-            if doc_id in combined_scores:
-                combined_scores[doc_id]['keyword_score'] = score
-                combined_scores[doc_id]['combined_score'] += score * 0.3
-            else:
-                combined_scores[doc_id] = {
-                    'metadata': metadata,
-                    'vector_score': 0,
-                    'keyword_score': score,
-                    'combined_score': score * 0.3
-                }
+        # Boost scores for documents with matching metadata keywords (2 per matched keyword)
+        self._sync_keyword_index()
+        for word in query_words:
+            postings = self._keyword_index.get(word)
+            if postings is not None:
+                doc_scores[postings] += 2
         
-        # Sort by combined score
-        sorted_results = sorted(
-            combined_scores.values(),
-            key=lambda x: x['combined_score'],
-            reverse=True
-        )
+        # Normalize scores
+        max_score = doc_scores.max() if len(doc_scores) else 0.0
+        if max_score > 0:
+            doc_scores /= max_score
+        return doc_scores
+    
+    def _top_k(self, scores: np.ndarray, k: int, candidates: np.ndarray = None) -> List[Tuple[Dict, float]]:
+        """Highest-scoring k documents (among candidates, default all), best first; ties by doc order"""
+        if candidates is None:
+            candidates = np.arange(len(scores))
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
         
-        # Return top k results
-        results = []
-        for item in sorted_results[:k]:
-            results.append((item['metadata'], item['combined_score']))
+        # Select the top k without sorting every document
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.lexsort((top, -scores[top]))]
         
-        return results
-    
-    def save(self, filepath: str):
-        """Save vector store to disk"""
-        data = {
-            'vectors': self.vectors,
-            'metadata': self.metadata,
-            'text_index': self.text_index,
-            'embedder': self.embedder
-        }
-        with open(filepath, 'wb') as f:
-            pickle.dump(data, f)
-    
-    def load(self, filepath: str):
-        """Load vector store from disk"""
-        with open(filepath, 'rb') as f:
-            data = pickle.load(f)
-        self.vectors = data['vectors']
-        self.metadata = data['metadata']
-        self.text_index = data['text_index']
-        self.embedder = data['embedder']
+        return [(self.metadata[doc_id], float(scores[doc_id])) for doc_id in top]
+
+
+# Formats DocumentProcessor converts with Docling; everything else is parsed as text/markup
+_DOCLING_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc', '.pptx', '.ppt'})
+
+# Part of every chunk cache key: bump whenever extraction or chunking output changes
+# (TextChunker, separators, keyword extraction, Docling options) so older chunks aren't reused
+_CHUNK_CACHE_VERSION = 1
 
 
 class DocumentProcessor:
     """Process various document formats using Docling for better extraction"""
     
-    def __init__(self):
-        """Initialize Docling document converter"""
-        # Configure Docling pipeline for PDF processing
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr = True  # Enable OCR for scanned documents
-        pipeline_options.do_table_structure = True  # Extract table structures
-        
-        # Initialize converter with options (no backend specification needed - auto-detected)
-        self.converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: pipeline_options,
-            }
-        )
+    # One converter per process: its OCR and table-structure models are loaded once
+    # and shared by every DocumentProcessor
+    _converter = None
+    _converter_lock = threading.Lock()
     
-    def process_file(self, filepath: str, filename: str) -> str:
-        """Extract text from various file formats using Docling"""
+    @property
+    def converter(self) -> DocumentConverter:
+        """
+        Docling converter, built on the first Docling-format file; plain-text formats
+        never load its OCR/layout models
+        """
+        return self._shared_converter()
+    
+    @classmethod
+    def _shared_converter(cls) -> DocumentConverter:
+        """Build the process-wide Docling converter on first use"""
+        with cls._converter_lock:
+            if cls._converter is None:
+                # Configure Docling pipeline for PDF processing
+                pipeline_options = PdfPipelineOptions()
+                pipeline_options.do_ocr = True  # Enable OCR for scanned documents
+                pipeline_options.do_table_structure = True  # Extract table structures
+                
+                # Initialize converter with options (no backend specification needed - auto-detected)
+                cls._converter = DocumentConverter(
+                    format_options={
+                        InputFormat.PDF: pipeline_options,
+                    }
+                )
+            return cls._converter
+    
+    def process_file(self, filepath: Union[str, bytes], filename: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """
+        Extract text from various file formats using Docling
+        filepath: path to the file, or its raw contents (see process_bytes)
+        stream: let the legacy PDF/DOCX fallbacks return a lazy iterator of pages/paragraphs
+        (accepted by TextChunker.chunk_text) instead of one joined string
+        """
         ext = os.path.splitext(filename)[1].lower()
         
         try:
             # Use Docling for PDF and DOCX files (better extraction)
-            if ext in ['.pdf', '.docx', '.doc', '.pptx', '.ppt']:
-                return self._process_with_docling(filepath)
+            if ext in _DOCLING_EXTENSIONS:
+                return self._process_with_docling(filepath, filename)
             elif ext == '.txt':
                 return self._process_txt(filepath)
             elif ext == '.md':
@@ -548,20 +1103,28 @@ class DocumentProcessor:
             # Fallback to legacy methods if Docling fails
             try:
                 if ext == '.pdf':
-                    return self._process_pdf_legacy(filepath)
+                    pages = self._process_pdf_legacy(filepath)
+                    return pages if stream else '\n'.join(pages)
                 elif ext in ['.docx', '.doc']:
-                    return self._process_docx_legacy(filepath)
+                    paragraphs = self._process_docx_legacy(filepath)
+                    return paragraphs if stream else '\n'.join(paragraphs)
             except Exception as fallback_error:
                 logger.error(f"Fallback processing also failed: {fallback_error}")
             raise
     
-    def _process_with_docling(self, filepath: str) -> str:
+    def process_bytes(self, data: bytes, filename: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """Extract text from in-memory file contents; filename picks the parser as in process_file"""
+        return self.process_file(data, filename, stream=stream)
+    
+    def _process_with_docling(self, filepath: Union[str, bytes], filename: str) -> str:
         """
         Use Docling to extract text from document
         Docling provides better quality extraction for PDFs, Word docs, and PowerPoints
         """
         try:
-            # Convert document using Docling
+            # Convert document using Docling (raw contents are wrapped as a named stream)
+            if isinstance(filepath, bytes):
+                filepath = DocumentStream(name=filename, stream=BytesIO(filepath))
             result = self.converter.convert(filepath)
             
             # Extract markdown text (Docling converts to markdown)
@@ -575,55 +1138,136 @@ class DocumentProcessor:
             logger.error(f"Docling processing failed: {e}")
             raise
     
-    def _process_pdf_legacy(self, filepath: str) -> str:
-        """Legacy PDF extraction using PyPDF2 (fallback)"""
-        text = []
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text.append(page.extract_text())
-        return '\n'.join(text)
-    
-    def _process_docx_legacy(self, filepath: str) -> str:
-        """Legacy DOCX extraction using python-docx (fallback)"""
-        doc = docx.Document(filepath)
-        text = []
-        for paragraph in doc.paragraphs:
-            text.append(paragraph.text)
-        return '\n'.join(text)
+    def _process_pdf_legacy(self, filepath: Union[str, bytes]) -> Iterator[str]:
+        """Legacy PDF extraction using PyPDF2 (fallback), yielding page text as each page is parsed"""
+        # Open eagerly so unreadable files fail here rather than mid-iteration
+        pdf_reader = PyPDF2.PdfReader(BytesIO(filepath) if isinstance(filepath, bytes) else filepath)
+        return (page.extract_text() for page in pdf_reader.pages)
+    
+    def _process_docx_legacy(self, filepath: Union[str, bytes]) -> Iterator[str]:
+        """Legacy DOCX extraction using python-docx (fallback), yielding paragraph text"""
+        doc = docx.Document(BytesIO(filepath) if isinstance(filepath, bytes) else filepath)
+        return (paragraph.text for paragraph in doc.paragraphs)
     
     @staticmethod
-    def _process_txt(filepath: str) -> str:
-        """Read text file"""
+    def _process_txt(filepath: Union[str, bytes]) -> str:
+        """Read text file (or decode raw contents)"""
+        if isinstance(filepath, bytes):
+            return filepath.decode('utf-8')
         with open(filepath, 'r', encoding='utf-8') as file:
             return file.read()
     
     @staticmethod
-    def _process_markdown(filepath: str) -> str:
+    def _process_markdown(filepath: Union[str, bytes]) -> str:
         """Process markdown file"""
-        with open(filepath, 'r', encoding='utf-8') as file:
-            md_text = file.read()
+        md_text = DocumentProcessor._process_txt(filepath)
+        
+        if MarkdownIt is not None:
+            # Collect text straight from the token stream, skipping the HTML round-trip
+            blocks = []
+            for token in MarkdownIt().parse(md_text):
+                if token.type == 'inline':
+                    blocks.append(''.join(
+                        '\n' if child.type in ('softbreak', 'hardbreak') else child.content
+                        for child in token.children
+                        if child.type in ('text', 'code_inline', 'softbreak', 'hardbreak')
+                    ))
+                elif token.type in ('fence', 'code_block'):
+                    blocks.append(token.content)
+                elif token.type == 'html_block':
+                    blocks.append(BeautifulSoup(token.content, 'lxml').get_text())
+            return '\n\n'.join(blocks)
+        
         # Convert markdown to plain text (remove formatting)
         html = markdown.markdown(md_text)
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml')
         return soup.get_text()
     
     @staticmethod
-    def _process_html(filepath: str) -> str:
+    def _process_html(filepath: Union[str, bytes]) -> str:
         """Extract text from HTML"""
-        with open(filepath, 'r', encoding='utf-8') as file:
-            html = file.read()
-        soup = BeautifulSoup(html, 'html.parser')
+        html = DocumentProcessor._process_txt(filepath)
+        # lxml parses in C; several times faster than html.parser on large pages
+        soup = BeautifulSoup(html, 'lxml')
         # Remove script and style elements
         for script in soup(["script", "style"]):
             script.decompose()
         return soup.get_text()
 
 
+@lru_cache(maxsize=1)
+def get_document_processor() -> DocumentProcessor:
+    """Process-wide DocumentProcessor, built on first use (tests and services can share it)"""
+    return DocumentProcessor()
+
+
+# Per-process DocumentProcessor for ingestion workers (Docling setup is paid once per process)
+_worker_processor = None
+
+
+def _init_ingest_worker():
+    """ProcessPoolExecutor initializer: build this worker's DocumentProcessor"""
+    global _worker_processor
+    _worker_processor = get_document_processor()
+
+
+def _extract_chunks(filepath: str, filename: str, chunk_size: int, chunk_overlap: int) -> List[Dict[str, Any]]:
+    """Worker task: extract a document's text and chunk it"""
+    text = _worker_processor.process_file(filepath, filename, stream=True)
+    return TextChunker.chunk_text(text, chunk_size=chunk_size, overlap=chunk_overlap)
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query responses with a time-to-live. Keys start with
+    the tuple of index names they were computed from, so a changed index can
+    invalidate exactly its own entries.
+    """
+    
+    def __init__(self, max_size: int = 100, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.RLock()
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Cached response for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return self._copy(entry[1])
+    
+    def put(self, key: Tuple, response: Dict[str, Any]):
+        """Cache a response, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, self._copy(response))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, index_name: str):
+        """Drop every entry computed from index_name"""
+        with self._lock:
+            for key in [key for key in self._entries if index_name in key[0]]:
+                del self._entries[key]
+    
+    @staticmethod
+    def _copy(response: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers truncate result texts and rescore results in place
+        return {**response, 'results': [dict(result) for result in response.get('results', [])]}
+
+
 class RAGService:
     """Main RAG service for document management and retrieval"""
     
-    def __init__(self, storage_path: str = 'rag_storage', config=None):
+    def __init__(self, storage_path: str = 'rag_storage', config=None,
+                 processor: Optional[DocumentProcessor] = None):
+        """processor: DocumentProcessor to reuse (e.g. get_document_processor()); one is built if omitted"""
         self.storage_path = storage_path
         self.indexes = {}  # Multiple indexes for different document collections
         self.chunker = TextChunker()
@@ -639,7 +1283,13 @@ class RAGService:
             self.max_context_length = getattr(config, 'RAG_MAX_CONTEXT_LENGTH', 2000)
             self.enable_caching = getattr(config, 'RAG_ENABLE_CACHING', True)
             self.cache_size = getattr(config, 'RAG_CACHE_SIZE', 100)
+            self.query_cache_ttl = getattr(config, 'RAG_QUERY_CACHE_TTL', 300)
             self.min_relevance_score = getattr(config, 'RAG_MIN_RELEVANCE_SCORE', 0.3)
+            self.ingest_workers = getattr(config, 'RAG_INGEST_WORKERS', 4)
+            self.query_workers = getattr(config, 'RAG_QUERY_WORKERS', 8)
+            self.vector_dtype = getattr(config, 'RAG_VECTOR_DTYPE', 'float32')
+            self.enable_chunk_cache = getattr(config, 'RAG_ENABLE_CHUNK_CACHE', True)
+            self.chunk_cache_max_entries = getattr(config, 'RAG_CHUNK_CACHE_MAX_ENTRIES', 1000)
         else:
             # Default values
             self.chunk_size = 150
@@ -650,21 +1300,52 @@ class RAGService:
             self.max_context_length = 2000
             self.enable_caching = True
             self.cache_size = 100
+            self.query_cache_ttl = 300
             self.min_relevance_score = 0.3
+            self.ingest_workers = 4
+            self.query_workers = 8
+            self.vector_dtype = 'float32'
+            self.enable_chunk_cache = True
+            self.chunk_cache_max_entries = 1000
+        
+        # Formatted responses of recent queries, invalidated whenever an index changes
+        self.query_cache = QueryCache(max_size=self.cache_size, ttl=self.query_cache_ttl) if self.enable_caching else None
+        
+        # Bumped on every index change; list_indexes output is cached per version
+        self._indexes_version = 0
+        self._list_indexes_cache = None  # (version, result)
+        
+        # Thread pool for multi-index queries, created on first use
+        self._query_pool = None
+        self._query_pool_lock = threading.Lock()
         
         # Initialize DocumentProcessor with Docling
-        logger.info("Initializing document processor with Docling...")
-        self.processor = DocumentProcessor()
-        logger.info("Document processor initialized successfully")
+        if processor is not None:
+            self.processor = processor
+        else:
+            logger.info("Initializing document processor with Docling...")
+            self.processor = DocumentProcessor()
+            logger.info("Document processor initialized successfully")
         
         # Create storage directory
         os.makedirs(storage_path, exist_ok=True)
         os.makedirs(os.path.join(storage_path, 'documents'), exist_ok=True)
-        os.makedirs(os.path.join(storage_path, 'indexes'), exist_ok=True)
+        self._indexes_dir = os.path.join(storage_path, 'indexes')
+        self._chunk_cache_dir = os.path.join(storage_path, 'chunk_cache')
+        os.makedirs(self._indexes_dir, exist_ok=True)
+        os.makedirs(self._chunk_cache_dir, exist_ok=True)
+        if self.enable_chunk_cache:
+            self._prune_chunk_cache()
         
         # Load existing indexes
         self._load_indexes()
         
+        # Compile the embedding kernel now rather than on the first request; it is
+        # shared by every index's embedder (vocabularies stay per index)
+        start_time = time.monotonic()
+        SimpleEmbedder().embed('warmup')
+        logger.info(f"Embedding kernel warmed up in {time.monotonic() - start_time:.2f}s")
+        
         logger.info(f"RAG Service initialized with chunk_size={self.chunk_size}, default_k={self.default_k}, timeout={self.query_timeout}s")
     
     def create_index(self, index_name: str) -> Dict[str, Any]:
@@ -675,7 +1356,8 @@ class RAGService:
         self.indexes[index_name] = {
             'vector_store': VectorStore(
                 enable_cache=self.enable_caching,
-                cache_size=self.cache_size
+                cache_size=self.cache_size,
+                vector_dtype=self.vector_dtype
             ),
             'documents': [],
             'created_at': datetime.now().isoformat(),
@@ -686,26 +1368,209 @@ class RAGService:
             }
         }
         
+        self._index_changed(index_name)
         return {'success': True, 'message': f'Index {index_name} created'}
     
     def upload_document(self, index_name: str, filepath: str, filename: str, metadata: Dict = None) -> Dict[str, Any]:
         """Process and add document to index"""
+        return self._upload_document(index_name, filepath, filename, metadata)
+    
+    def upload_document_from_bytes(self, index_name: str, data: bytes, filename: str, metadata: Dict = None) -> Dict[str, Any]:
+        """Process and add in-memory file contents to index, without a round-trip through disk"""
+        return self._upload_document(index_name, data, filename, metadata)
+    
+    def _upload_document(self, index_name: str, filepath: Union[str, bytes], filename: str,
+                         metadata: Dict = None) -> Dict[str, Any]:
+        """Shared upload path; filepath is a path or the file's raw contents"""
         if index_name not in self.indexes:
             return {'error': f'Index {index_name} not found'}
         
         try:
-            # Extract text from document
-            text = self.processor.process_file(filepath, filename)
+            cache_path = self._chunk_cache_path(filepath, filename)
+            chunks = self._load_cached_chunks(cache_path)
+            if chunks is None:
+                # Extract text from document
+                text = self.processor.process_file(filepath, filename, stream=True)
+                
+                # Chunk the text with optimized settings
+                chunks = self.chunker.chunk_text(text, chunk_size=self.chunk_size, overlap=self.chunk_overlap)
+                self._store_cached_chunks(cache_path, chunks)
             
-            # Generate document ID
-            doc_id = hashlib.md5(f"{filename}_{datetime.now().isoformat()}".encode()).hexdigest()
+            result = self._add_chunked_documents(index_name, [(filepath, filename, chunks)], metadata)[0]
+            return {'success': True, **result}
+            
+        except Exception as e:
+            logger.error(f"Error uploading document: {e}")
+            return {'error': str(e)}
+    
+    def upload_documents(self, index_name: str, files: List[Tuple[str, str]], metadata: Dict = None) -> Dict[str, Any]:
+        """
+        Process several (filepath, filename) documents at once: text extraction and
+        chunking run in parallel worker processes, then every chunk is embedded and
+        indexed with a single add_documents call
+        """
+        if index_name not in self.indexes:
+            return {'error': f'Index {index_name} not found'}
+        
+        parsed = []
+        errors = []
+        
+        try:
+            # Files whose chunks are cached skip extraction entirely
+            pending = []
+            for filepath, filename in files:
+                cache_path = self._chunk_cache_path(filepath, filename)
+                chunks = self._load_cached_chunks(cache_path)
+                if chunks is None:
+                    pending.append((filepath, filename, cache_path))
+                else:
+                    parsed.append((filepath, filename, chunks))
             
-            # Chunk the text with optimized settings
-            chunks = self.chunker.chunk_text(text, chunk_size=self.chunk_size, overlap=self.chunk_overlap)
+            # Plain-text formats parse far faster than a spawned worker starts up (each one
+            # re-imports Docling), so only Docling formats go to the process pool
+            inline = [item for item in pending if os.path.splitext(item[1])[1].lower() not in _DOCLING_EXTENSIONS]
+            pending = [item for item in pending if os.path.splitext(item[1])[1].lower() in _DOCLING_EXTENSIONS]
+            for filepath, filename, cache_path in inline:
+                try:
+                    text = self.processor.process_file(filepath, filename, stream=True)
+                    chunks = self.chunker.chunk_text(text, chunk_size=self.chunk_size, overlap=self.chunk_overlap)
+                except Exception as e:
+                    logger.error(f"Error processing document '{filename}': {e}")
+                    errors.append({'filename': filename, 'error': str(e)})
+                    continue
+                self._store_cached_chunks(cache_path, chunks)
+                parsed.append((filepath, filename, chunks))
             
-            # Prepare chunks for vector store
-            chunk_texts = []
-            chunk_metadatas = []
+            if pending:
+                # Spawn (not fork) so workers don't inherit the server's Docling/torch threads
+                with ProcessPoolExecutor(
+                    max_workers=max(1, min(self.ingest_workers, len(pending))),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_ingest_worker
+                ) as pool:
+                    futures = [
+                        (filepath, filename, cache_path,
+                         pool.submit(_extract_chunks, filepath, filename, self.chunk_size, self.chunk_overlap))
+                        for filepath, filename, cache_path in pending
+                    ]
+                    for filepath, filename, cache_path, future in futures:
+                        try:
+                            chunks = future.result()
+                        except Exception as e:
+                            logger.error(f"Error processing document '{filename}': {e}")
+                            errors.append({'filename': filename, 'error': str(e)})
+                            continue
+                        self._store_cached_chunks(cache_path, chunks)
+                        parsed.append((filepath, filename, chunks))
+            
+            processed = self._add_chunked_documents(index_name, parsed, metadata) if parsed else []
+            
+        except Exception as e:
+            logger.error(f"Error uploading documents: {e}")
+            return {'error': str(e)}
+        
+        return {
+            'success': len(processed) > 0,
+            'processed': processed,
+            'errors': errors
+        }
+    
+    def _chunk_cache_path(self, filepath: Union[str, bytes], filename: str) -> Optional[str]:
+        """
+        Cache file for a document's chunks, keyed by _CHUNK_CACHE_VERSION, the SHA-256 of its
+        contents, its extension (which picks the parser) and the chunking settings; None when disabled
+        """
+        if not self.enable_chunk_cache:
+            return None
+        if isinstance(filepath, bytes):
+            digest = hashlib.sha256(filepath)
+        else:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        ext = os.path.splitext(filename)[1].lower().lstrip('.')
+        key = f"v{_CHUNK_CACHE_VERSION}_{digest.hexdigest()}_{ext}_{self.chunk_size}_{self.chunk_overlap}"
+        return os.path.join(self._chunk_cache_dir, f'{key}.json')
+    
+    def _load_cached_chunks(self, cache_path: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Chunks previously extracted from identical file contents, or None on a miss"""
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                chunks = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable chunk cache {cache_path}: {e}")
+            return None
+        try:
+            os.utime(cache_path)  # Mark as recently used for _prune_chunk_cache
+        except OSError:
+            pass
+        logger.info(f"Reusing cached chunks from {os.path.basename(cache_path)}")
+        return chunks
+    
+    def _store_cached_chunks(self, cache_path: Optional[str], chunks: List[Dict[str, Any]]):
+        """Write a document's chunks to the cache (atomically, so readers never see a partial file)"""
+        if cache_path is None:
+            return
+        tmp_path = f'{cache_path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(chunks, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write chunk cache {cache_path}: {e}")
+        self._prune_chunk_cache()
+    
+    def _prune_chunk_cache(self):
+        """
+        Remove chunk cache entries from other _CHUNK_CACHE_VERSIONs, then the least recently
+        used ones beyond chunk_cache_max_entries (entries outlive their documents otherwise)
+        """
+        prefix = f'v{_CHUNK_CACHE_VERSION}_'
+        stale = []
+        current = []
+        try:
+            with os.scandir(self._chunk_cache_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.json'):
+                        continue  # In-progress .tmp writes
+                    if entry.name.startswith(prefix):
+                        current.append((entry.stat().st_mtime, entry.path))
+                    else:
+                        stale.append(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not scan chunk cache: {e}")
+            return
+        
+        excess = len(current) - self.chunk_cache_max_entries
+        if excess > 0:
+            stale.extend(path for _, path in heapq.nsmallest(excess, current))
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already removed by a concurrent prune
+        if stale:
+            logger.info(f"Pruned {len(stale)} chunk cache entries")
+    
+    def _add_chunked_documents(self, index_name: str, documents: List[Tuple[Union[str, bytes], str, List[Dict[str, Any]]]],
+                               metadata: Dict = None) -> List[Dict[str, Any]]:
+        """
+        Index already-chunked (filepath, filename, chunks) documents with one add_documents call and save;
+        filepath may be the raw contents of an in-memory upload, which has no path
+        """
+        index_data = self.indexes[index_name]
+        
+        # Prepare chunks for vector store
+        chunk_texts = []
+        chunk_metadatas = []
+        new_documents = []
+        
+        for filepath, filename, chunks in documents:
+            # Generate document ID
+            doc_id = hashlib.md5(f"{filename}_{datetime.now().isoformat()}".encode()).hexdigest()
             
             for chunk in chunks:
                 chunk_texts.append(chunk['text'])
@@ -719,45 +1584,48 @@ class RAGService:
                 }
                 chunk_metadatas.append(chunk_metadata)
             
-            # Add to vector store
-            self.indexes[index_name]['vector_store'].add_documents(chunk_texts, chunk_metadatas)
-            
-            # Update index stats
-            file_size = os.path.getsize(filepath)
-            self.indexes[index_name]['documents'].append({
+            in_memory = isinstance(filepath, bytes)
+            new_documents.append({
                 'id': doc_id,
                 'filename': filename,
-                'filepath': filepath,
-                'size': file_size,
+                'filepath': None if in_memory else filepath,
+                'size': len(filepath) if in_memory else os.path.getsize(filepath),
                 'chunks': len(chunks),
                 'uploaded_at': datetime.now().isoformat(),
                 'metadata': metadata
             })
-            
-            stats = self.indexes[index_name]['stats']
+        
+        # Add to vector store
+        index_data['vector_store'].add_documents(chunk_texts, chunk_metadatas)
+        
+        # Update index stats
+        stats = index_data['stats']
+        for document in new_documents:
+            index_data['documents'].append(document)
+            self._documents_by_id(index_data)[document['id']] = document
             stats['total_documents'] += 1
-            stats['total_chunks'] += len(chunks)
-            stats['total_size'] += file_size
-            
-            # Save index
-            self._save_index(index_name)
-            
-            logger.info(f"Document '{filename}' uploaded to index '{index_name}': {len(chunks)} chunks created")
-            
-            return {
-                'success': True,
-                'document_id': doc_id,
-                'chunks': len(chunks),
-                'size': file_size
+            stats['total_chunks'] += document['chunks']
+            stats['total_size'] += document['size']
+            logger.info(f"Document '{document['filename']}' uploaded to index '{index_name}': {document['chunks']} chunks created")
+        
+        # Save index
+        self._save_index(index_name)
+        
+        return [
+            {
+                'filename': document['filename'],
+                'document_id': document['id'],
+                'chunks': document['chunks'],
+                'size': document['size']
             }
-            
-        except Exception as e:
-            logger.error(f"Error uploading document: {e}")
-            return {'error': str(e)}
+            for document in new_documents
+        ]
     
-    def query(self, index_name: str, query: str, k: int = None, mode: str = 'hybrid', min_score: float = None) -> Dict[str, Any]:
+    def query(self, index_name: str, query: str, k: int = None, mode: str = 'hybrid', min_score: float = None,
+              tokens: List[str] = None) -> Dict[str, Any]:
         """
         Query documents in a specific index only
+        tokens: Optional pre-tokenized query, shared when querying several indexes
         Ensures results are strictly from the specified index
         """
         if index_name not in self.indexes:
@@ -774,6 +1642,13 @@ class RAGService:
         if min_score is None:
             min_score = self.min_relevance_score
         
+        cache_key = ((index_name,), 'query', query, k, mode, min_score)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"Query cache hit for index '{index_name}': {query[:50]}...")
+                return cached
+        
         start_time = time.time()
         
         try:
@@ -781,7 +1656,7 @@ class RAGService:
             vector_store = self.indexes[index_name]['vector_store']
             
             # Verify the vector store has documents
-            if not vector_store.vectors:
+            if not vector_store.metadata:
                 return {
                     'success': True,
                     'query': query,
@@ -796,22 +1671,21 @@ class RAGService:
                 k=k, 
                 mode=mode,
                 min_score=min_score,
-                timeout=self.query_timeout
+                timeout=self.query_timeout,
+                tokens=tokens
             )
             
             # Format results and add index verification
             formatted_results = []
             total_context_length = 0
+            document_ids = self._documents_by_id(self.indexes[index_name])
             
             for metadata, score in results:
                 # Double-check that this result belongs to the current index
                 doc_id = metadata.get('document_id')
-                index_data = self.indexes[index_name]
                 
                 # Verify document belongs to this index
-                doc_exists = any(doc['id'] == doc_id for doc in index_data['documents'])
-                
-                if doc_exists:
+                if doc_id in document_ids:
                     # Truncate text if needed to fit in context limit
                     text = metadata['text']
                     if total_context_length + len(text) > self.max_context_length:
@@ -839,7 +1713,7 @@ class RAGService:
             
             logger.info(f"RAG query completed in {query_time:.3f}s: {len(formatted_results)} results (min_score={self.min_relevance_score})")
             
-            return {
+            response = {
                 'success': True,
                 'query': query,
                 'index_name': index_name,  # Include index name in response
@@ -849,6 +1723,9 @@ class RAGService:
                 'query_time': query_time,
                 'context_length': total_context_length
             }
+            if self.query_cache is not None:
+                self.query_cache.put(cache_key, response)
+            return response
             
         except Exception as e:
             logger.error(f"Error querying index {index_name}: {e}")
@@ -869,47 +1746,59 @@ class RAGService:
         if min_score is None:
             min_score = self.min_relevance_score
         
+        cache_key = (tuple(index_names), 'multi', query, k, mode, min_score)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"Query cache hit for indexes {index_names}: {query[:50]}...")
+                return cached
+        
         start_time = time.time()
-        all_results = []
+        per_index_results = []
         errors = []
         
-        # Query each index
-        for index_name in index_names:
+        # Query the indexes concurrently (the similarity kernels release the GIL);
+        # results are collected in index order so merge ties stay deterministic
+        # Every index tokenizes the same way, so the query is tokenized once for all of them
+        # (embeddings can't be shared: each index has its own vocabulary and IDF)
+        tokens = SimpleEmbedder._tokenize(query)
+        pending = []
+        for index_name in dict.fromkeys(index_names):  # An index listed twice is queried once
             if index_name not in self.indexes:
                 errors.append(f'Index {index_name} not found')
                 continue
-            
+            if len(index_names) == 1:
+                pending.append((index_name, None))
+            else:
+                pending.append((index_name, self._get_query_pool().submit(
+                    self.query, index_name, query, k=k, mode=mode, min_score=min_score, tokens=tokens
+                )))
+        
+        for index_name, future in pending:
             try:
-                result = self.query(index_name, query, k=k, mode=mode, min_score=min_score)
+                if future is None:
+                    result = self.query(index_name, query, k=k, mode=mode, min_score=min_score, tokens=tokens)
+                else:
+                    result = future.result()
                 if result.get('success') and result.get('results'):
-                    all_results.extend(result['results'])
+                    per_index_results.append(result['results'])
             except Exception as e:
                 errors.append(f'Error querying {index_name}: {str(e)}')
                 logger.error(f"Error querying index {index_name}: {e}")
         
-        # Sort all results by score (descending)
-        all_results.sort(key=lambda x: x['score'], reverse=True)
+        # Each index returns its results best-first, so a k-way merge orders them all
+        # (ties keep index order, as the stable sort over the concatenation did)
+        # The same document uploaded to several indexes yields the same chunks; keep only
+        # the best-scoring copy of each chunk text so duplicates don't use up the context budget
+        all_results = []
+        seen_texts = set()
+        for result in heapq.merge(*per_index_results, key=lambda x: x['score'], reverse=True):
+            if result['text'] not in seen_texts:
+                seen_texts.add(result['text'])
+                all_results.append(result)
         
         # Take top k results and limit by context length
-        top_results = []
-        total_context_length = 0
-        
-        for result in all_results:
-            if len(top_results) >= k:
-                break
-                
-            text_length = len(result['text'])
-            if total_context_length + text_length > self.max_context_length:
-                # Try to fit partial result
-                remaining = self.max_context_length - total_context_length
-                if remaining > 100:  # Only include if meaningful amount remains
-                    result['text'] = result['text'][:remaining] + "..."
-                    total_context_length += remaining
-                    top_results.append(result)
-                break
-            
-            total_context_length += text_length
-            top_results.append(result)
+        top_results, total_context_length = self._pack_context(all_results, k)
         
         query_time = time.time() - start_time
         
@@ -919,7 +1808,7 @@ class RAGService:
         
         logger.info(f"Multi-index RAG query completed in {query_time:.3f}s: {len(top_results)} results from {len(index_names)} indexes")
         
-        return {
+        response = {
             'success': True,
             'query': query,
             'index_names': index_names,
@@ -931,6 +1820,47 @@ class RAGService:
             'context_length': total_context_length,
             'errors': errors if errors else None
         }
+        # Responses with errors (e.g. a missing index) aren't cached, since they can change
+        if self.query_cache is not None and not errors:
+            self.query_cache.put(cache_key, response)
+        return response
+    
+    def _get_query_pool(self) -> ThreadPoolExecutor:
+        """Thread pool shared by multi-index queries, created on first use"""
+        with self._query_pool_lock:
+            if self._query_pool is None:
+                self._query_pool = ThreadPoolExecutor(
+                    max_workers=max(1, self.query_workers),
+                    thread_name_prefix="RAG-Query"
+                )
+            return self._query_pool
+    
+    def _pack_context(self, results: List[Dict], k: int) -> Tuple[List[Dict], int]:
+        """
+        Take results in order while their texts fit in max_context_length, found from
+        prefix sums of the text lengths. The first result that overflows is truncated
+        into the remaining budget if more than 100 characters remain.
+        Returns the kept results and their total context length.
+        """
+        candidates = results[:k]
+        if not candidates:
+            return [], 0
+        
+        cumulative = np.cumsum([len(result['text']) for result in candidates])
+        fit = int(np.searchsorted(cumulative, self.max_context_length, side='right'))
+        top_results = candidates[:fit]
+        total_context_length = int(cumulative[fit - 1]) if fit else 0
+        
+        if fit < len(candidates):
+            # Try to fit partial result
+            remaining = self.max_context_length - total_context_length
+            if remaining > 100:  # Only include if meaningful amount remains
+                result = candidates[fit]
+                result['text'] = result['text'][:remaining] + "..."
+                total_context_length += remaining
+                top_results.append(result)
+        
+        return top_results, total_context_length
     
     def _rerank_results(self, query: str, results: List[Dict], k: int) -> List[Dict]:
         """
@@ -963,22 +1893,7 @@ class RAGService:
             results.sort(key=lambda x: x['score'], reverse=True)
             
             # Apply context length limiting after reranking
-            top_results = []
-            total_context_length = 0
-            
-            for result in results[:k]:
-                text_length = len(result['text'])
-                if total_context_length + text_length > self.max_context_length:
-                    remaining = self.max_context_length - total_context_length
-                    if remaining > 100:
-                        result['text'] = result['text'][:remaining] + "..."
-                        total_context_length += remaining
-                        top_results.append(result)
-                    break
-                
-                total_context_length += text_length
-                top_results.append(result)
-            
+            top_results, _ = self._pack_context(results, k)
             return top_results
             
         except Exception as e:
@@ -987,9 +1902,15 @@ class RAGService:
             return results[:k]
     
     def list_indexes(self) -> Dict[str, Any]:
-        """List all available indexes with document names"""
+        """List all available indexes with document names (cached until an index changes)"""
+        cached = self._list_indexes_cache
+        if cached is not None and cached[0] == self._indexes_version:
+            return cached[1]
+        
+        version = self._indexes_version
         index_list = []
-        for name, index_data in self.indexes.items():
+        # Name order, so the listing doesn't depend on creation or directory-scan order
+        for name, index_data in sorted(self.indexes.items()):
             # Extract document names from the index
             document_names = [doc['filename'] for doc in index_data['documents']]
             
@@ -1000,7 +1921,15 @@ class RAGService:
                 'documents': document_names  # Add list of document names
             })
         
-        return {'indexes': index_list}
+        result = {'indexes': index_list}
+        self._list_indexes_cache = (version, result)
+        return result
+    
+    def _index_changed(self, index_name: str):
+        """Invalidate everything cached from an index after it was created, modified or deleted"""
+        self._indexes_version += 1
+        if self.query_cache is not None:
+            self.query_cache.invalidate(index_name)
     
     def delete_index(self, index_name: str) -> Dict[str, Any]:
         """Delete an index"""
@@ -1009,9 +1938,11 @@ class RAGService:
         
         # Remove from memory
         del self.indexes[index_name]
+        self._index_changed(index_name)
         
         # Remove from disk
-        index_path = os.path.join(self.storage_path, 'indexes', f'{index_name}.pkl')
+        shutil.rmtree(self._index_dir(index_name), ignore_errors=True)
+        index_path = os.path.join(self._indexes_dir, f'{index_name}.pkl')
         if os.path.exists(index_path):
             os.remove(index_path)
         
@@ -1058,6 +1989,17 @@ class RAGService:
             'documents': documents
         }
     
+    def count_documents(self, index_name: str) -> Dict[str, Any]:
+        """Number of documents in an index, without building the document list"""
+        if index_name not in self.indexes:
+            return {'error': f'Index {index_name} not found'}
+        
+        return {
+            'success': True,
+            'index_name': index_name,
+            'total_documents': len(self.indexes[index_name]['documents'])
+        }
+    
     def get_document_details(self, index_name: str, document_id: str) -> Dict[str, Any]:
         """
         Get detailed information about a specific document
@@ -1068,25 +2010,22 @@ class RAGService:
         index_data = self.indexes[index_name]
         
         # Find the document
-        document = None
-        for doc in index_data['documents']:
-            if doc['id'] == document_id:
-                document = doc
-                break
+        document = self._documents_by_id(index_data).get(document_id)
         
         if not document:
             return {'error': f'Document {document_id} not found in index {index_name}'}
         
         # Get all chunks for this document from vector store
+        vector_store = index_data['vector_store']
         chunks = []
-        for metadata in index_data['vector_store'].metadata:
-            if metadata.get('document_id') == document_id:
-                chunks.append({
-                    'chunk_id': metadata.get('chunk_id', 0),
-                    'text_preview': metadata.get('text', '')[:200] + '...',
-                    'word_count': metadata.get('word_count', 0),
-                    'keywords': metadata.get('keywords', [])
-                })
+        for row in vector_store.document_rows(document_id):
+            metadata = vector_store.metadata[row]
+            chunks.append({
+                'chunk_id': metadata.get('chunk_id', 0),
+                'text_preview': metadata.get('text', '')[:200] + '...',
+                'word_count': metadata.get('word_count', 0),
+                'keywords': metadata.get('keywords', [])
+            })
         
         return {
             'success': True,
@@ -1113,14 +2052,11 @@ class RAGService:
         index_data = self.indexes[index_name]
         
         # Find and remove the document
-        document = None
-        for i, doc in enumerate(index_data['documents']):
-            if doc['id'] == document_id:
-                document = index_data['documents'].pop(i)
-                break
+        document = self._documents_by_id(index_data).pop(document_id, None)
         
         if not document:
             return {'error': f'Document {document_id} not found in index {index_name}'}
+        index_data['documents'].remove(document)
         
         # Update stats
         index_data['stats']['total_documents'] -= 1
@@ -1136,25 +2072,114 @@ class RAGService:
             'document_id': document_id
         }
     
+    @staticmethod
+    def _documents_by_id(index_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """document id -> document record for an index; built on first use, not persisted"""
+        doc_by_id = index_data.get('doc_by_id')
+        if doc_by_id is None:
+            doc_by_id = index_data['doc_by_id'] = {doc['id']: doc for doc in index_data['documents']}
+        return doc_by_id
+    
+    def _index_dir(self, index_name: str) -> str:
+        """Directory holding an index's append-only files"""
+        return os.path.join(self._indexes_dir, index_name)
+    
     def _save_index(self, index_name: str):
-        """Save index to disk"""
-        index_path = os.path.join(self.storage_path, 'indexes', f'{index_name}.pkl')
-        with open(index_path, 'wb') as f:
-            pickle.dump(self.indexes[index_name], f)
+        """
+        Save index to disk. Only chunks added since the last save are appended to
+        vectors.f32/chunks.jsonl; manifest.json (documents, stats and committed sizes)
+        is then replaced atomically and is the commit point.
+        """
+        index_data = self.indexes[index_name]
+        vector_store = index_data['vector_store']
+        index_dir = self._index_dir(index_name)
+        os.makedirs(index_dir, exist_ok=True)
+        
+        # Every change to an index is saved, so this is where its cached results go stale
+        self._index_changed(index_name)
+        
+        rows, chunk_bytes = vector_store.append_pending(index_dir)
+        
+        manifest = {
+            'created_at': index_data['created_at'],
+            'documents': index_data['documents'],
+            'stats': index_data['stats'],
+            'embedding_dim': vector_store.embedding_dim,
+            'position_hash': vector_store.embedder.position_hash,
+            'rows': rows,
+            'chunk_bytes': chunk_bytes
+        }
+        manifest_path = os.path.join(index_dir, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, default=str)
+            _fsync(f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        _fsync_dir(index_dir)
+        
+        vector_store.commit_persisted((rows, chunk_bytes))
+    
+    def _load_index_dir(self, index_dir: str) -> Dict[str, Any]:
+        """Load an index saved by _save_index"""
+        with open(os.path.join(index_dir, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        
+        vector_store = VectorStore(
+            embedding_dim=manifest['embedding_dim'],
+            enable_cache=self.enable_caching,
+            cache_size=self.cache_size,
+            vector_dtype=self.vector_dtype
+        )
+        vector_store.load_appended(
+            index_dir, manifest['rows'], manifest['chunk_bytes'], manifest['position_hash']
+        )
+        
+        return {
+            'vector_store': vector_store,
+            'documents': manifest['documents'],
+            'created_at': manifest['created_at'],
+            'stats': manifest['stats']
+        }
     
     def _load_indexes(self):
-        """Load all indexes from disk"""
-        index_dir = os.path.join(self.storage_path, 'indexes')
-        if not os.path.exists(index_dir):
+        """Load all indexes from disk, migrating pickled (.pkl) indexes to the append-only layout"""
+        if not os.path.exists(self._indexes_dir):
             return
         
-        for filename in os.listdir(index_dir):
-            if filename.endswith('.pkl'):
+        # scandir reports entry types from the directory listing itself, so files
+        # are told apart from index directories without a stat call each
+        with os.scandir(self._indexes_dir) as it:
+            entries = list(it)
+        index_dirs = [
+            entry for entry in entries
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, 'manifest.json'))
+        ]
+        
+        # Index directories load independently; overlap their file reads at startup
+        if index_dirs:
+            with ThreadPoolExecutor(
+                max_workers=min(8, len(index_dirs), os.cpu_count() or 1),
+                thread_name_prefix="RAG-Load"
+            ) as pool:
+                futures = [
+                    (entry.name, pool.submit(self._load_index_dir, entry.path))
+                    for entry in index_dirs
+                ]
+                for index_name, future in futures:
+                    try:
+                        self.indexes[index_name] = future.result()
+                        logger.info(f"Loaded index: {index_name}")
+                    except Exception as e:
+                        logger.error(f"Error loading index {index_name}: {e}")
+        
+        for entry in entries:
+            filename, index_path = entry.name, entry.path
+            if filename.endswith('.pkl') and entry.is_file():
                 index_name = filename[:-4]
-                index_path = os.path.join(index_dir, filename)
                 try:
                     with open(index_path, 'rb') as f:
                         self.indexes[index_name] = pickle.load(f)
-                    logger.info(f"Loaded index: {index_name}")
+                    self._save_index(index_name)
+                    os.remove(index_path)
+                    logger.info(f"Loaded index: {index_name} (migrated from {filename})")
                 except Exception as e:
-                    logger.error(f"Error loading index {index_name}: {e}")
\ No newline at end of file
+                    logger.error(f"Error loading index {index_name}: {e}")
@@ -6,13 +6,25 @@ Updated to use OptimizedLLMService for better performance.
 import asyncio
 import logging
 import time
-from flask import request, jsonify, current_app
+from flask import request, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from utils.logger import log_endpoint, log_custom_event
+from utils.helpers import json_dumps, json_response
 from .async_routes import async_route
 
 logger = logging.getLogger(__name__)
 
+# Disk usage barely moves between health polls; reuse a sample for this many seconds
+DISK_USAGE_TTL = 5.0
+
+# Liveness probes poll these endpoints constantly; serve pre-encoded bodies
+_HEALTH_BODY = json_dumps({
+    "status": "healthy",
+    "service": "Local LLM API",
+    "version": "1.0.0"
+})
+CACHE_STATUS_TTL = 1.0  # Seconds an encoded cache_status body is reused
+
 class RouteHandlers:
     """Shared route handlers to eliminate code duplication."""
     
@@ -20,22 +32,41 @@ class RouteHandlers:
         self.model_manager = model_manager
         self.llm_service = llm_service
         self.app_config = app_config
+        self._disk_usage_cache = None  # (sampled_at, usage)
+        self._cache_status_body = None  # (encoded_at, body)
+        
+        try:
+            import psutil
+            # Prime the non-blocking CPU sampler: later interval=None calls report
+            # usage since the previous call instead of sleeping to measure it
+            psutil.cpu_percent(interval=None)
+        except ImportError:
+            pass
+    
+    def _disk_usage(self):
+        """psutil.disk_usage('/'), reused for DISK_USAGE_TTL seconds"""
+        import psutil
+        now = time.monotonic()
+        cached = self._disk_usage_cache
+        if cached is None or now - cached[0] > DISK_USAGE_TTL:
+            cached = self._disk_usage_cache = (now, psutil.disk_usage('/'))
+        return cached[1]
     
     @log_endpoint("upload_model")
     def upload_model(self):
         """Handle model upload requests."""
         # Check if the post request has the file part
         if 'file' not in request.files:
-            return jsonify({"error": "No file part in the request"}), 400
+            return json_response({"error": "No file part in the request"}), 400
         
         file = request.files['file']
         
         # If user does not select file, browser also submits an empty part without filename
         if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+            return json_response({"error": "No file selected"}), 400
         
         if not file or not self.model_manager.is_allowed_file(file.filename, self.app_config.ALLOWED_EXTENSIONS):
-            return jsonify({
+            return json_response({
                 "error": f"Invalid file type. Only {', '.join(self.app_config.ALLOWED_EXTENSIONS)} files are allowed"
             }), 400
         
@@ -43,7 +74,7 @@ class RouteHandlers:
         
         # Check if file already exists
         if self.model_manager.model_exists(filename):
-            return jsonify({"error": "File already exists"}), 409
+            return json_response({"error": "File already exists"}), 409
         
         try:
             file_path = self.model_manager.get_model_path(filename)
@@ -62,7 +93,7 @@ class RouteHandlers:
             )
             
             logger.info(f"Model uploaded successfully: {filename}")
-            return jsonify({
+            return json_response({
                 "message": "File uploaded successfully",
                 "filename": filename,
                 "model_info": model_info
@@ -80,7 +111,7 @@ class RouteHandlers:
                 }
             )
             logger.error(f"Error uploading model: {e}")
-            return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+            return json_response({"error": f"Failed to save file: {str(e)}"}), 500
     
     @log_endpoint("list_models")
     def list_models(self):
@@ -95,10 +126,10 @@ class RouteHandlers:
                 {"model_count": models_data.get('count', 0)}
             )
             
-            return jsonify(models_data), 200
+            return json_response(models_data), 200
         except Exception as e:
             logger.error(f"Error listing models: {e}")
-            return jsonify({"error": f"Failed to list models: {str(e)}"}), 500
+            return json_response({"error": f"Failed to list models: {str(e)}"}), 500
     
     @log_endpoint("delete_model")
     def delete_model(self, model_name):
@@ -112,7 +143,7 @@ class RouteHandlers:
             
             # Check if file exists
             if not self.model_manager.model_exists(filename):
-                return jsonify({"error": "Model not found"}), 404
+                return json_response({"error": "Model not found"}), 404
             
             # Delete the model
             updated_data = self.model_manager.remove_model(filename)
@@ -128,7 +159,7 @@ class RouteHandlers:
             )
             
             logger.info(f"Model deleted successfully: {filename}")
-            return jsonify({
+            return json_response({
                 "message": "Model deleted successfully",
                 "filename": filename,
                 "remaining_models": updated_data['count']
@@ -145,7 +176,7 @@ class RouteHandlers:
                 }
             )
             logger.error(f"Error deleting model: {e}")
-            return jsonify({"error": f"Failed to delete model: {str(e)}"}), 500
+            return json_response({"error": f"Failed to delete model: {str(e)}"}), 500
     
     @log_endpoint("sync_models")
     def sync_models(self):
@@ -160,15 +191,14 @@ class RouteHandlers:
                 {"model_count": models_data.get('count', 0)}
             )
             
-            return jsonify({
+            return json_response({
                 "message": "Models list synchronized successfully",
                 "data": models_data
             }), 200
         except Exception as e:
             logger.error(f"Error syncing models: {e}")
-            return jsonify({"error": f"Failed to sync models: {str(e)}"}), 500
+            return json_response({"error": f"Failed to sync models: {str(e)}"}), 500
     
-    @log_endpoint("generate_response")
     @log_endpoint("generate_response")
     @async_route
     async def generate_response(self):
@@ -178,16 +208,16 @@ class RouteHandlers:
             
             # Validate request data
             if not data:
-                return jsonify({"error": "Request body is required"}), 400
+                return json_response({"error": "Request body is required"}), 400
             
             question = data.get('question')
             model_name = data.get('model_name')
             
             if not question:
-                return jsonify({"error": "Question is required"}), 400
+                return json_response({"error": "Question is required"}), 400
             
             if not model_name:
-                return jsonify({"error": "Model name is required"}), 400
+                return json_response({"error": "Model name is required"}), 400
             
             # Use exact model name as provided by frontend - no modifications
             frontend_model_name = model_name.strip()
@@ -199,7 +229,7 @@ class RouteHandlers:
             model_filename = frontend_model_name + '.gguf' if not frontend_model_name.endswith('.gguf') else frontend_model_name
             
             if not self.model_manager.model_exists(model_filename):
-                return jsonify({
+                return json_response({
                     "error": f"Requested model '{frontend_model_name}' not found",
                     "requested_model": frontend_model_name,
                     "expected_file": model_filename
@@ -209,7 +239,7 @@ class RouteHandlers:
             template = data.get('template')
             llm_params = {
                 'n_gpu_layers': data.get('n_gpu_layers', self.app_config.DEFAULT_N_GPU_LAYERS),
-                'n_batch': data.get('n_batch', self.app_config.DEFAULT_N_BATCH),
+                'n_batch': data.get('n_batch'),  # Sized to the CPU cache when omitted
                 'temperature': data.get('temperature', self.app_config.DEFAULT_TEMPERATURE),
                 'max_tokens': data.get('max_tokens', 200),
                 'n_ctx': data.get('n_ctx', 4096)
@@ -218,17 +248,13 @@ class RouteHandlers:
             # Remove None values but keep zeros and explicit values
             llm_params = {k: v for k, v in llm_params.items() if v is not None}
             
-            # Log generation request with exact frontend model
-            log_custom_event(
-                "text_generation_start",
-                f"Starting text generation with frontend-requested model: {frontend_model_name}",
-                {
-                    "frontend_model_name": frontend_model_name,
-                    "model_path": model_path,
-                    "question_length": len(question),
-                    "llm_params": llm_params
-                }
-            )
+            # Request details shared by the single completion event logged below
+            event_data = {
+                "frontend_model_name": frontend_model_name,
+                "model_path": model_path,
+                "question_length": len(question),
+                "llm_params": llm_params
+            }
             
             # Use exactly the frontend-provided model name and path
             result = await self.llm_service.generate_response(
@@ -250,27 +276,25 @@ class RouteHandlers:
                     "text_generation_success",
                     f"Text generation completed successfully with frontend-requested model: {frontend_model_name}",
                     {
-                        "frontend_model_name": frontend_model_name,
-                        "model_path": model_path,
+                        **event_data,
                         "response_length": len(str(result.get('response', ''))),
                         "processing_time": result.get('processing_time'),
                         "exact_model_used": True
                     }
                 )
-                return jsonify(result), 200
+                return json_response(result), 200
             else:
                 # Log generation failure with frontend model info
                 log_custom_event(
                     "text_generation_failure",
                     f"Text generation failed with frontend-requested model: {frontend_model_name}",
                     {
-                        "frontend_model_name": frontend_model_name,
-                        "model_path": model_path,
+                        **event_data,
                         "error": result.get('error'),
                         "exact_model_requested": True
                     }
                 )
-                return jsonify(result), 500
+                return json_response(result), 500
                 
         except Exception as e:
             log_custom_event(
@@ -286,7 +310,7 @@ class RouteHandlers:
                 }
             )
             logger.error(f"Error generating response with frontend model '{frontend_model_name if 'frontend_model_name' in locals() else 'unknown'}': {e}")
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": str(e),
                 "requested_model": frontend_model_name if 'frontend_model_name' in locals() else None
@@ -294,17 +318,14 @@ class RouteHandlers:
     
     def health_check(self):
         """Handle health check requests."""
-        return jsonify({
-            "status": "healthy",
-            "service": "Local LLM API",
-            "version": "1.0.0"
-        }), 200
+        return Response(_HEALTH_BODY, status=200, mimetype='application/json')
     
     @log_endpoint("clear_cache")
     def clear_cache(self):
         """Handle cache clear requests."""
         try:
             self.llm_service.clear_cache()
+            self._cache_status_body = None
             
             # Log cache clear
             log_custom_event(
@@ -313,34 +334,48 @@ class RouteHandlers:
                 {}
             )
             
-            return jsonify({"message": "Cache cleared successfully"}), 200
+            return json_response({"message": "Cache cleared successfully"}), 200
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
-            return jsonify({"error": f"Failed to clear cache: {str(e)}"}), 500
+            return json_response({"error": f"Failed to clear cache: {str(e)}"}), 500
     
     def cache_status(self):
         """Handle cache status requests."""
         try:
-            cached_models = self.llm_service.get_cached_models()
-            
-            return jsonify({
-                "cached_models": cached_models,
-                "count": len(cached_models)
-            }), 200
+            now = time.monotonic()
+            cached = self._cache_status_body
+            if cached is None or now - cached[0] > CACHE_STATUS_TTL:
+                cached_models = self.llm_service.get_cached_models()
+                body = json_dumps({
+                    "cached_models": cached_models,
+                    "count": len(cached_models)
+                })
+                cached = self._cache_status_body = (now, body)
+            
+            return Response(cached[1], status=200, mimetype='application/json')
         except Exception as e:
             logger.error(f"Error getting cache status: {e}")
-            return jsonify({"error": f"Failed to get cache status: {str(e)}"}), 500
+            return json_response({"error": f"Failed to get cache status: {str(e)}"}), 500
     
     def get_logs(self):
-        """Return all API and error logs (last 100 lines each)."""
+        """Return recent API and error logs, streamed as one JSON object entry by entry."""
         from utils.log_viewer import LogViewer
         log_viewer = LogViewer(self.app_config.LOG_DIR if hasattr(self.app_config, 'LOG_DIR') else './logs')
-        api_logs = log_viewer.get_api_logs()
-        error_logs = log_viewer.get_error_logs()
-        return jsonify({
-            "api_logs": api_logs,
-            "error_logs": error_logs
-        }), 200
+        
+        def json_array_items(entries):
+            for i, entry in enumerate(entries):
+                yield (b', ' if i else b'') + json_dumps(entry)
+        
+        def generate():
+            # Same {"api_logs": [...], "error_logs": [...]} body as before, but each
+            # entry is encoded and sent on its own instead of building one large string
+            yield b'{"api_logs": ['
+            yield from json_array_items(log_viewer.get_api_logs())
+            yield b'], "error_logs": ['
+            yield from json_array_items(log_viewer.get_error_logs())
+            yield b']}'
+        
+        return Response(stream_with_context(generate()), mimetype='application/json'), 200
     
     @log_endpoint("clear_logs")
     def clear_logs(self):
@@ -349,24 +384,24 @@ class RouteHandlers:
             from utils.log_viewer import LogViewer
             log_viewer = LogViewer(self.app_config.LOG_DIR if hasattr(self.app_config, 'LOG_DIR') else './logs')
             log_viewer.clear_logs()
-            return jsonify({"message": "Logs cleared successfully"}), 200
+            return json_response({"message": "Logs cleared successfully"}), 200
         except Exception as e:
             logger.error(f"Error clearing logs: {e}")
-            return jsonify({"error": f"Failed to clear logs: {str(e)}"}), 500
+            return json_response({"error": f"Failed to clear logs: {str(e)}"}), 500
     
     @log_endpoint("get_service_stats")
     def get_service_stats(self):
         """Get comprehensive service statistics."""
         try:
             stats = self.llm_service.get_service_stats()
-            return jsonify({
+            return json_response({
                 "success": True,
                 "stats": stats,
                 "timestamp": time.time()
             }), 200
         except Exception as e:
             logger.error(f"Error getting service stats: {e}")
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": str(e)
             }), 500
@@ -380,10 +415,11 @@ class RouteHandlers:
             
             # Get system performance
             import psutil
+            memory = psutil.virtual_memory()
             system_stats = {
-                "cpu_percent": psutil.cpu_percent(interval=0.1),
-                "memory_percent": psutil.virtual_memory().percent,
-                "memory_available_gb": round(psutil.virtual_memory().available / (1024**3), 2)
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_available_gb": round(memory.available / (1024**3), 2)
             }
             
             # Check GPU availability
@@ -402,7 +438,7 @@ class RouteHandlers:
             except ImportError:
                 gpu_stats = {"gpu_available": False, "error": "PyTorch not available"}
             
-            return jsonify({
+            return json_response({
                 "success": True,
                 "optimization_status": {
                     "service_type": "OptimizedLLMService",
@@ -420,7 +456,7 @@ class RouteHandlers:
             
         except Exception as e:
             logger.error(f"Error getting performance metrics: {e}")
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": str(e)
             }), 500
@@ -431,20 +467,20 @@ class RouteHandlers:
         try:
             concurrency_manager = getattr(current_app, 'concurrency_manager', None)
             if concurrency_manager is None:
-                return jsonify({
+                return json_response({
                     "success": False,
                     "error": "Concurrency manager not available"
                 }), 503
             
             stats = concurrency_manager.get_stats()
-            return jsonify({
+            return json_response({
                 "success": True,
                 "concurrency_stats": stats,
                 "timestamp": time.time()
             }), 200
         except Exception as e:
             logger.error(f"Error getting concurrency stats: {e}")
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": str(e)
             }), 500
@@ -456,10 +492,10 @@ class RouteHandlers:
             import psutil
             import os
             
-            # Get system info
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Get system info (non-blocking: CPU usage since the previous sample)
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            disk = self._disk_usage()
             
             # Get service stats
             service_stats = self.llm_service.get_service_stats()
@@ -494,11 +530,11 @@ class RouteHandlers:
                 }
             }
             
-            return jsonify(health_data), 200
+            return json_response(health_data), 200
             
         except ImportError:
             # psutil not available, return basic health
-            return jsonify({
+            return json_response({
                 "success": True,
                 "message": "psutil not available for detailed system stats",
                 "basic_health": {
@@ -508,7 +544,7 @@ class RouteHandlers:
             }), 200
         except Exception as e:
             logger.error(f"Error getting system health: {e}")
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": str(e)
             }), 500
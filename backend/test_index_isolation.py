@@ -4,7 +4,9 @@ Test to verify that queries only return results from the specified index
 import sys
 import os
 import tempfile
+import shutil
 import logging
+from contextlib import contextmanager
 
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -15,6 +17,36 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+@contextmanager
+def temp_storage():
+    """
+    Temporary storage directory. Removal errors are ignored: on Windows the index's
+    memory-mapped vectors can still be open, which makes TemporaryDirectory cleanup raise.
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        yield temp_dir
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+class LogBuf:
+    """Collects log lines and emits them as a single record"""
+    
+    def __init__(self):
+        self.lines = []
+    
+    def info(self, message):
+        self.lines.append(message)
+    
+    def flush(self, logger):
+        if self.lines:
+            logger.info("\n".join(self.lines))
+            self.lines.clear()
+
+def indexes_other_than(results, expected_index):
+    """Names of indexes other than expected_index that any result came from"""
+    return {res['index_name'] for res in results} - {expected_index}
+
 def test_index_isolation():
     """Test that queries only return results from the specified index"""
     from services.rag_service import RAGService
@@ -24,7 +56,7 @@ def test_index_isolation():
     logger.info("=" * 70)
     
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with temp_storage() as temp_dir:
             # Initialize RAG service
             logger.info("\n1. Initializing RAG service...")
             rag_service = RAGService(storage_path=temp_dir)
@@ -39,7 +71,6 @@ def test_index_isolation():
             # Create medical document
             logger.info("\n3. Adding documents to different indexes...")
             
-            medical_doc = os.path.join(temp_dir, "medical.txt")
             medical_content = """
             Medical Research on Cardiovascular Disease
             
@@ -52,12 +83,9 @@ def test_index_isolation():
             interventions such as angioplasty or bypass surgery. Prevention through
             regular exercise and healthy diet is crucial.
             """
-            with open(medical_doc, 'w') as f:
-                f.write(medical_content)
-            
-            medical_result = rag_service.upload_document(
+            medical_result = rag_service.upload_document_from_bytes(
                 index_name="index_medical",
-                filepath=medical_doc,
+                data=medical_content.encode(),
                 filename="medical.txt",
                 metadata={"category": "medical", "topic": "cardiovascular"}
             )
@@ -65,7 +93,6 @@ def test_index_isolation():
             logger.info(f"      - Document ID: {medical_result['document_id']}")
             
             # Create technology document
-            tech_doc = os.path.join(temp_dir, "technology.txt")
             tech_content = """
             Artificial Intelligence and Machine Learning Technologies
             
@@ -77,24 +104,22 @@ def test_index_isolation():
             to build complex models. Cloud computing provides the infrastructure
             needed for training large-scale AI models.
             """
-            with open(tech_doc, 'w') as f:
-                f.write(tech_content)
-            
-            tech_result = rag_service.upload_document(
+            tech_result = rag_service.upload_document_from_bytes(
                 index_name="index_technology",
-                filepath=tech_doc,
+                data=tech_content.encode(),
                 filename="technology.txt",
                 metadata={"category": "technology", "topic": "AI"}
             )
             logger.info(f"   ✅ Uploaded to 'index_technology': technology.txt")
             logger.info(f"      - Document ID: {tech_result['document_id']}")
             
-            # Test queries to ensure isolation
-            logger.info("\n4. Testing query isolation...")
-            logger.info("   " + "-" * 66)
+            # Test queries to ensure isolation; each test's lines are logged as one record
+            buf = LogBuf()
+            buf.info("\n4. Testing query isolation...")
+            buf.info("   " + "-" * 66)
             
             # Query medical index with medical question
-            logger.info("\n   Test 1: Query 'index_medical' with medical question")
+            buf.info("\n   Test 1: Query 'index_medical' with medical question")
             query1 = "What are cardiovascular disease risk factors?"
             result1 = rag_service.query(
                 index_name="index_medical",
@@ -104,26 +129,27 @@ def test_index_isolation():
             )
             
             if 'error' not in result1:
-                logger.info(f"   ✅ Query: '{query1}'")
-                logger.info(f"   ✅ Results from index: {result1['index_name']}")
-                logger.info(f"   ✅ Total results: {result1['total_results']}")
+                buf.info(f"   ✅ Query: '{query1}'")
+                buf.info(f"   ✅ Results from index: {result1['index_name']}")
+                buf.info(f"   ✅ Total results: {result1['total_results']}")
                 
-                for i, res in enumerate(result1['results'], 1):
-                    logger.info(f"\n   Result {i}:")
-                    logger.info(f"   - Index: {res['index_name']}")
-                    logger.info(f"   - Document: {res['document_name']}")
-                    logger.info(f"   - Score: {res['score']:.3f}")
-                    logger.info(f"   - Keywords: {', '.join(res['keywords'][:5])}")
-                    
-                    # Verify it's from medical index
-                    if res['index_name'] != 'index_medical':
-                        logger.error(f"   ❌ ERROR: Result from wrong index!")
-                        return False
+                buf.info("   ✅ Results: " + ", ".join(
+                    f"{res['document_name']} ({res['score']:.3f})" for res in result1['results']
+                ))
                 
-                logger.info("\n   ✅ All results are from 'index_medical'")
+                # Verify they're all from medical index
+                wrong_indexes = indexes_other_than(result1['results'], 'index_medical')
+                if wrong_indexes:
+                    buf.flush(logger)
+                    logger.error(f"   ❌ ERROR: Results from wrong index(es): {wrong_indexes}")
+                    return False
+                
+                buf.info("\n   ✅ All results are from 'index_medical'")
+            
+            buf.flush(logger)
             
             # Query technology index with tech question
-            logger.info("\n   Test 2: Query 'index_technology' with tech question")
+            buf.info("\n   Test 2: Query 'index_technology' with tech question")
             query2 = "What are machine learning frameworks?"
             result2 = rag_service.query(
                 index_name="index_technology",
@@ -133,26 +159,27 @@ def test_index_isolation():
             )
             
             if 'error' not in result2:
-                logger.info(f"   ✅ Query: '{query2}'")
-                logger.info(f"   ✅ Results from index: {result2['index_name']}")
-                logger.info(f"   ✅ Total results: {result2['total_results']}")
+                buf.info(f"   ✅ Query: '{query2}'")
+                buf.info(f"   ✅ Results from index: {result2['index_name']}")
+                buf.info(f"   ✅ Total results: {result2['total_results']}")
                 
-                for i, res in enumerate(result2['results'], 1):
-                    logger.info(f"\n   Result {i}:")
-                    logger.info(f"   - Index: {res['index_name']}")
-                    logger.info(f"   - Document: {res['document_name']}")
-                    logger.info(f"   - Score: {res['score']:.3f}")
-                    logger.info(f"   - Keywords: {', '.join(res['keywords'][:5])}")
-                    
-                    # Verify it's from technology index
-                    if res['index_name'] != 'index_technology':
-                        logger.error(f"   ❌ ERROR: Result from wrong index!")
-                        return False
+                buf.info("   ✅ Results: " + ", ".join(
+                    f"{res['document_name']} ({res['score']:.3f})" for res in result2['results']
+                ))
                 
-                logger.info("\n   ✅ All results are from 'index_technology'")
+                # Verify they're all from technology index
+                wrong_indexes = indexes_other_than(result2['results'], 'index_technology')
+                if wrong_indexes:
+                    buf.flush(logger)
+                    logger.error(f"   ❌ ERROR: Results from wrong index(es): {wrong_indexes}")
+                    return False
+                
+                buf.info("\n   ✅ All results are from 'index_technology'")
+            
+            buf.flush(logger)
             
             # Cross-test: Query medical index with tech question (should return no/low results)
-            logger.info("\n   Test 3: Query 'index_medical' with tech question (cross-test)")
+            buf.info("\n   Test 3: Query 'index_medical' with tech question (cross-test)")
             query3 = "What are machine learning frameworks?"
             result3 = rag_service.query(
                 index_name="index_medical",
@@ -162,21 +189,24 @@ def test_index_isolation():
             )
             
             if 'error' not in result3:
-                logger.info(f"   ✅ Query: '{query3}'")
-                logger.info(f"   ✅ Results from index: {result3['index_name']}")
-                logger.info(f"   ✅ Total results: {result3['total_results']}")
+                buf.info(f"   ✅ Query: '{query3}'")
+                buf.info(f"   ✅ Results from index: {result3['index_name']}")
+                buf.info(f"   ✅ Total results: {result3['total_results']}")
                 
                 if result3['total_results'] == 0:
-                    logger.info("   ✅ Correctly returned no results (query mismatch)")
+                    buf.info("   ✅ Correctly returned no results (query mismatch)")
                 else:
-                    for res in result3['results']:
-                        if res['index_name'] != 'index_medical':
-                            logger.error(f"   ❌ ERROR: Result from wrong index!")
-                            return False
-                    logger.info("   ✅ All results correctly from 'index_medical' only")
+                    wrong_indexes = indexes_other_than(result3['results'], 'index_medical')
+                    if wrong_indexes:
+                        buf.flush(logger)
+                        logger.error(f"   ❌ ERROR: Results from wrong index(es): {wrong_indexes}")
+                        return False
+                    buf.info("   ✅ All results correctly from 'index_medical' only")
+            
+            buf.flush(logger)
             
             # Cross-test: Query technology index with medical question
-            logger.info("\n   Test 4: Query 'index_technology' with medical question (cross-test)")
+            buf.info("\n   Test 4: Query 'index_technology' with medical question (cross-test)")
             query4 = "What are cardiovascular disease risk factors?"
             result4 = rag_service.query(
                 index_name="index_technology",
@@ -186,24 +216,27 @@ def test_index_isolation():
             )
             
             if 'error' not in result4:
-                logger.info(f"   ✅ Query: '{query4}'")
-                logger.info(f"   ✅ Results from index: {result4['index_name']}")
-                logger.info(f"   ✅ Total results: {result4['total_results']}")
+                buf.info(f"   ✅ Query: '{query4}'")
+                buf.info(f"   ✅ Results from index: {result4['index_name']}")
+                buf.info(f"   ✅ Total results: {result4['total_results']}")
                 
                 if result4['total_results'] == 0:
-                    logger.info("   ✅ Correctly returned no results (query mismatch)")
+                    buf.info("   ✅ Correctly returned no results (query mismatch)")
                 else:
-                    for res in result4['results']:
-                        if res['index_name'] != 'index_technology':
-                            logger.error(f"   ❌ ERROR: Result from wrong index!")
-                            return False
-                    logger.info("   ✅ All results correctly from 'index_technology' only")
+                    wrong_indexes = indexes_other_than(result4['results'], 'index_technology')
+                    if wrong_indexes:
+                        buf.flush(logger)
+                        logger.error(f"   ❌ ERROR: Results from wrong index(es): {wrong_indexes}")
+                        return False
+                    buf.info("   ✅ All results correctly from 'index_technology' only")
+            
+            buf.flush(logger)
             
             # Verify document counts per index
             logger.info("\n5. Verifying document counts per index...")
             
-            medical_docs = rag_service.list_documents("index_medical")
-            tech_docs = rag_service.list_documents("index_technology")
+            medical_docs = rag_service.count_documents("index_medical")
+            tech_docs = rag_service.count_documents("index_technology")
             
             logger.info(f"   ✅ index_medical: {medical_docs['total_documents']} document(s)")
             logger.info(f"   ✅ index_technology: {tech_docs['total_documents']} document(s)")
@@ -224,10 +257,8 @@ def test_index_isolation():
             
             return True
             
-    except Exception as e:
-        logger.error(f"\n❌ Test failed with error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("\n❌ Test failed")
         return False
 
 if __name__ == "__main__":
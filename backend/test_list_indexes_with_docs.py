@@ -37,18 +37,24 @@ def test_list_indexes_with_documents():
         ]
         
         print("\n2. Uploading test documents...")
+        files_by_index = {}
         for index_name, filename, content in test_docs:
             # Create temporary file
             temp_file = os.path.join(temp_dir, filename)
             with open(temp_file, 'w', encoding='utf-8') as f:
                 f.write(content)
-            
-            # Upload to index
-            result = rag_service.upload_document(index_name, temp_file, filename)
+            files_by_index.setdefault(index_name, []).append((temp_file, filename))
+        
+        # Upload each index's documents in one batch
+        for index_name, files in files_by_index.items():
+            result = rag_service.upload_documents(index_name, files)
             if 'error' in result:
-                print(f"❌ Failed to upload {filename}: {result['error']}")
-            else:
-                print(f"✅ Uploaded {filename} to {index_name}")
+                print(f"❌ Failed to upload to {index_name}: {result['error']}")
+                continue
+            for document in result['processed']:
+                print(f"✅ Uploaded {document['filename']} to {index_name}")
+            for error in result['errors']:
+                print(f"❌ Failed to upload {error['filename']}: {error['error']}")
         
         # Test list_indexes
         print("\n3. Testing list_indexes()...")
@@ -77,6 +83,17 @@ def test_list_indexes_with_documents():
         print("="*70)
         
         all_passed = True
+        expected_by_index = {}
+        for index_name, filename, _ in test_docs:
+            expected_by_index.setdefault(index_name, []).append(filename)
+        for expected_docs in expected_by_index.values():
+            expected_docs.sort()
+        
+        index_names = [index['name'] for index in result['indexes']]
+        if index_names != sorted(index_names):
+            print(f"❌ Indexes are not listed in name order: {index_names}")
+            all_passed = False
+        
         for index in result['indexes']:
             if 'documents' not in index:
                 print(f"❌ Index '{index['name']}' missing 'documents' field")
@@ -85,8 +102,8 @@ def test_list_indexes_with_documents():
                 print(f"❌ Index '{index['name']}' 'documents' is not a list")
                 all_passed = False
             else:
-                expected_docs = [doc[1] for doc in test_docs if doc[0] == index['name']]
-                if set(index['documents']) == set(expected_docs):
+                expected_docs = expected_by_index.get(index['name'], [])
+                if sorted(index['documents']) == expected_docs:
                     print(f"✅ Index '{index['name']}' has correct documents: {index['documents']}")
                 else:
                     print(f"❌ Index '{index['name']}' documents mismatch")
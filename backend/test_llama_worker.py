@@ -0,0 +1,119 @@
+"""
+Test script to verify LlamaWorker requests and crash recovery in the model pool
+Usage: python test_llama_worker.py [path/to/model.gguf]
+(defaults to the first .gguf file in the upload folder)
+"""
+import sys
+import os
+import glob
+import logging
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for any single request
+REQUEST_TIMEOUT = 300
+
+def find_model(model_path=None):
+    """Model to test with: the given path, or the first .gguf in the upload folder"""
+    if model_path:
+        return model_path if os.path.exists(model_path) else None
+    from config import config
+    models = sorted(glob.glob(os.path.join(config['default'].UPLOAD_FOLDER, '*.gguf')))
+    return models[0] if models else None
+
+def test_submit(pool, model_path):
+    """A non-streaming request returns a completion"""
+    try:
+        worker = pool.get_or_load_model(model_path, n_ctx=512).model
+        result = worker.submit_future("Hello", max_tokens=8).result(timeout=REQUEST_TIMEOUT)
+        logger.info(f"✅ Submit returned: {result['choices'][0]['text']!r}")
+        return True
+    except Exception:
+        logger.exception("❌ Submit failed")
+        return False
+
+def test_stream(pool, model_path):
+    """A streaming request yields completion chunks"""
+    try:
+        worker = pool.get_or_load_model(model_path, n_ctx=512).model
+        chunks = list(worker.stream("Hello", max_tokens=8))
+        if not chunks:
+            logger.error("❌ Stream yielded no chunks")
+            return False
+        text = ''.join(chunk['choices'][0]['text'] for chunk in chunks)
+        logger.info(f"✅ Stream yielded {len(chunks)} chunks: {text!r}")
+        return True
+    except Exception:
+        logger.exception("❌ Stream failed")
+        return False
+
+def test_crash_recovery(pool, model_path):
+    """After the worker process dies, requests fail fast and the pool loads a new worker"""
+    from services.llama_worker import WorkerCrashedError
+
+    try:
+        crashed = pool.get_or_load_model(model_path, n_ctx=512).model
+        crashed.kill()  # Simulate a native crash
+        crashed.join(timeout=10)
+
+        try:
+            crashed.submit_future("Hello", max_tokens=8).result(timeout=REQUEST_TIMEOUT)
+            logger.error("❌ Request to the dead worker succeeded")
+            return False
+        except WorkerCrashedError as e:
+            logger.info(f"✅ Request to the dead worker failed: {e}")
+
+        worker = pool.get_or_load_model(model_path, n_ctx=512).model
+        if worker is crashed or not worker.is_alive():
+            logger.error("❌ Pool returned the dead worker")
+            return False
+
+        result = worker.submit_future("Hello", max_tokens=8).result(timeout=REQUEST_TIMEOUT)
+        logger.info(f"✅ Reloaded worker (pid {worker.pid}) returned: {result['choices'][0]['text']!r}")
+        return True
+    except Exception:
+        logger.exception("❌ Crash recovery failed")
+        return False
+
+def main():
+    """Run all tests"""
+    logger.info("=" * 60)
+    logger.info("Testing LlamaWorker and model pool crash recovery")
+    logger.info("=" * 60)
+
+    model_path = find_model(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not model_path:
+        logger.warning("⚠️ No model file provided or found. Skipping worker tests.")
+        return True
+
+    from services.optimized_llm_service import OptimizedModelPool
+    pool = OptimizedModelPool(max_models=1)
+
+    try:
+        results = [
+            ("Submit", test_submit(pool, model_path)),
+            ("Stream", test_stream(pool, model_path)),
+            ("Crash recovery", test_crash_recovery(pool, model_path)),
+        ]
+    finally:
+        pool.clear_all()
+
+    logger.info("=" * 60)
+    for test_name, result in results:
+        logger.info(f"{test_name}: {'✅ PASSED' if result else '❌ FAILED'}")
+    logger.info("=" * 60)
+
+    return all(result for _, result in results)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
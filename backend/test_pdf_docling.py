@@ -3,6 +3,7 @@ Test PDF document processing with Docling
 """
 import sys
 import os
+import argparse
 import logging
 
 # Add backend to path
@@ -15,20 +16,19 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def test_pdf_processing():
-    """Test processing a real PDF file"""
-    from services.rag_service import DocumentProcessor
+def test_pdf_processing(pdf_path=None):
+    """Test processing a real PDF file (pdf_path defaults to the TEST_PDF environment variable)"""
+    from services.rag_service import get_document_processor
     
-    # You can specify a PDF file path here
-    pdf_path = input("Enter the path to a PDF file (or press Enter to skip): ").strip()
+    pdf_path = pdf_path or os.environ.get('TEST_PDF')
     
     if not pdf_path or not os.path.exists(pdf_path):
-        logger.warning("No valid PDF file provided. Test skipped.")
+        logger.warning("No valid PDF file provided (pass --pdf PATH or set TEST_PDF). Test skipped.")
         return
     
     try:
         logger.info(f"Processing PDF: {pdf_path}")
-        processor = DocumentProcessor()
+        processor = get_document_processor()
         
         text = processor.process_file(pdf_path, os.path.basename(pdf_path))
         
@@ -40,11 +40,13 @@ def test_pdf_processing():
         logger.info("-" * 60)
         
         return True
-    except Exception as e:
-        logger.error(f"❌ Failed to process PDF: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("❌ Failed to process PDF")
         return False
 
 if __name__ == "__main__":
-    test_pdf_processing()
+    parser = argparse.ArgumentParser(description="Test PDF document processing with Docling")
+    parser.add_argument('--pdf', help="PDF file to process (defaults to $TEST_PDF; skipped if unset)")
+    args = parser.parse_args()
+    result = test_pdf_processing(args.pdf)
+    sys.exit(1 if result is False else 0)
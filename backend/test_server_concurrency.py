@@ -0,0 +1,109 @@
+"""
+Test script to verify the uvicorn server setup serves requests concurrently
+"""
+import sys
+import os
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# Each request blocks here until the other one arrives, so both only finish if they
+# are in flight at the same time; serialized requests time out instead
+_barrier = threading.Barrier(2, timeout=10)
+
+def create_test_app():
+    """Flask app with a sync and an async view that block, like a model load does"""
+    from flask import Flask
+
+    app = Flask(__name__)
+
+    @app.route('/sync')
+    def sync_view():
+        _barrier.wait()
+        return 'ok'
+
+    @app.route('/async')
+    async def async_view():
+        _barrier.wait()  # Blocking call inside an async view (cf. get_or_load_model)
+        return 'ok'
+
+    return app
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _get(url: str) -> str:
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read().decode()
+
+def test_concurrent_requests(path: str) -> bool:
+    """Two requests to path must be served at the same time"""
+    import uvicorn
+    from start_optimized import SERVER_OPTIONS
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        create_test_app, host='127.0.0.1', port=port, log_level='warning', **SERVER_OPTIONS
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    try:
+        while not server.started:
+            if not thread.is_alive():
+                logger.error("❌ Server failed to start")
+                return False
+            time.sleep(0.05)
+
+        _barrier.reset()
+        url = f'http://127.0.0.1:{port}{path}'
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(_get, url) for _ in range(2)]
+            results = [future.result() for future in futures]
+
+        logger.info(f"✅ Two {path} requests were served concurrently: {results}")
+        return True
+    except Exception:
+        logger.exception(f"❌ {path} requests were not served concurrently")
+        return False
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+def main():
+    """Run all tests"""
+    logger.info("=" * 60)
+    logger.info("Testing concurrent request handling")
+    logger.info("=" * 60)
+
+    results = [
+        ("Sync view", test_concurrent_requests('/sync')),
+        ("Async view", test_concurrent_requests('/async')),
+    ]
+
+    logger.info("=" * 60)
+    for test_name, result in results:
+        logger.info(f"{test_name}: {'✅ PASSED' if result else '❌ FAILED'}")
+    logger.info("=" * 60)
+
+    return all(result for _, result in results)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
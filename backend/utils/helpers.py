@@ -2,66 +2,121 @@
 Utility functions for the Local LLM application.
 """
 import os
+import re
+import json
+import time
 import hashlib
-from typing import Optional
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Optional
 
-def get_file_hash(file_path: str, algorithm: str = 'md5') -> Optional[str]:
-    """Calculate hash of a file."""
-    if not os.path.exists(file_path):
-        return None
-    
-    hash_func = hashlib.new(algorithm)
-    
+import numpy as np
+from flask import Response
+
+# Optional fast JSON encoder; falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Characters sanitize_filename replaces with '_'
+_SANITIZE_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+
+# Valid model names: alphanumeric, hyphen, underscore, dot
+_MODEL_NAME_RE = re.compile(r'[A-Za-z0-9._-]+')
+
+# Units for format_file_size, one per factor of 1024
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+MEMORY_CACHE_TTL = 1.0  # Seconds a get_available_memory reading is reused
+_memory_reading = None  # (read_at, available_bytes)
+
+def get_file_hash(file_path: str, algorithm: str = 'sha256') -> Optional[str]:
+    """
+    Calculate hash of a file (SHA-256 by default; pass algorithm='md5' for MD5).
+    Results are cached until the file's modification time or size changes.
+    """
     try:
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_func.update(chunk)
-        return hash_func.hexdigest()
+        stat = os.stat(file_path)
+        return _hash_file(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, algorithm)
     except (OSError, IOError):
         return None
 
+@lru_cache(maxsize=512)
+def _hash_file(file_path: str, mtime_ns: int, size: int, algorithm: str) -> str:
+    """Hash a file's contents; mtime_ns and size only key the cache. Errors are raised, not cached."""
+    with open(file_path, 'rb') as f:
+        # Python 3.11+ hashes the whole file in C, releasing the GIL
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        
+        hash_func = hashlib.new(algorithm)
+        buffer = bytearray(1 << 20)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hash_func.update(view[:n])
+        return hash_func.hexdigest()
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format."""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
+    # Unit index from the bit length: each unit covers 10 more bits (sizes under 1 B stay in B)
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1) if size_bytes >= 1 else 0
     
-    return f"{size_bytes:.1f} {size_names[i]}"
+    return f"{size_bytes / (1 << (10 * i)):.1f} {_SIZE_UNITS[i]}"
 
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename by removing potentially dangerous characters."""
-    # Remove or replace dangerous characters
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    
-    # Remove leading/trailing whitespace and dots
-    filename = filename.strip(' .')
-    
-    # Ensure filename is not empty
-    if not filename:
-        filename = 'unnamed_file'
-    
-    return filename
+    # Replace dangerous characters in one pass, then remove leading/trailing whitespace
+    # and dots; ensure filename is not empty
+    return filename.translate(_SANITIZE_TABLE).strip(' .') or 'unnamed_file'
 
 def validate_model_name(model_name: str) -> bool:
     """Validate model name format."""
     if not model_name:
         return False
     
-    # Check for valid characters (alphanumeric, hyphen, underscore, dot)
-    allowed_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_.')
-    return all(c in allowed_chars for c in model_name)
+    return _MODEL_NAME_RE.fullmatch(model_name) is not None
 
 def get_available_memory() -> Optional[int]:
-    """Get available system memory in bytes."""
-    try:
-        import psutil
-        return psutil.virtual_memory().available
-    except ImportError:
+    """Get available system memory in bytes (re-read at most once per MEMORY_CACHE_TTL)."""
+    global _memory_reading
+    if psutil is None:
         return None
+    
+    now = time.monotonic()
+    reading = _memory_reading
+    if reading is None or now - reading[0] > MEMORY_CACHE_TTL:
+        reading = _memory_reading = (now, psutil.virtual_memory().available)
+    return reading[1]
+
+def _json_default(obj: Any) -> Any:
+    """Encode numpy values and datetimes for the stdlib json fallback."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def json_dumps(obj: Any) -> bytes:
+    """Serialize obj to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default).encode()
+
+def json_response(obj: Any, status: int = 200) -> Response:
+    """Drop-in replacement for flask.jsonify that encodes with json_dumps."""
+    return Response(json_dumps(obj), status=status, mimetype='application/json')
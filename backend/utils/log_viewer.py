@@ -5,8 +5,9 @@ Provides tools to view and analyze API logs.
 import os
 import json
 import argparse
+from collections import deque
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 
 class LogViewer:
     """Utility class for viewing and analyzing API logs."""
@@ -23,25 +24,21 @@ class LogViewer:
         except json.JSONDecodeError:
             return None
     
-    def read_logs(self, log_file: str, lines: int = None) -> List[Dict]:
-        """Read and parse log entries."""
+    def iter_logs(self, log_file: str) -> Iterator[Dict]:
+        """Parse log entries one at a time, reading the file line by line."""
         if not os.path.exists(log_file):
-            return []
+            return
         
-        logs = []
         with open(log_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
             # Split by JSON object boundaries (lines starting with '{')
-            json_objects = []
             current_json = ""
             
-            for line in content.split('\n'):
+            for line in f:
+                line = line.rstrip('\n')
                 if line.strip().startswith('{') and current_json:
                     # Start of new JSON object, parse the previous one
                     try:
-                        parsed = json.loads(current_json)
-                        json_objects.append(parsed)
+                        yield json.loads(current_json)
                     except json.JSONDecodeError:
                         pass
                     current_json = line
@@ -51,18 +48,13 @@ class LogViewer:
             # Don't forget the last JSON object
             if current_json.strip():
                 try:
-                    parsed = json.loads(current_json)
-                    json_objects.append(parsed)
+                    yield json.loads(current_json)
                 except json.JSONDecodeError:
                     pass
-            
-            # Return the requested number of lines (most recent)
-            if lines and len(json_objects) > lines:
-                logs = json_objects[-lines:]
-            else:
-                logs = json_objects
-        
-        return logs
+    
+    def read_logs(self, log_file: str, lines: int = None) -> List[Dict]:
+        """Read and parse log entries (only the most recent `lines` are kept in memory)."""
+        return list(deque(self.iter_logs(log_file), maxlen=lines or None))
     
     def get_api_logs(self, lines: int = 5001) -> List[Dict]:
         """Get recent API logs."""
@@ -10,6 +10,10 @@ from datetime import datetime, timezone, timedelta
 from functools import wraps
 from flask import request, g
 import time
+import threading
+
+# Endpoint names whose log_endpoint wrapper is running on the current thread
+_active_endpoints = threading.local()
 
 class APILogFormatter(logging.Formatter):
     """Custom formatter for API logs with structured output."""
@@ -250,8 +254,16 @@ def log_endpoint(endpoint_name):
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            active = getattr(_active_endpoints, 'names', None)
+            if active is None:
+                active = _active_endpoints.names = set()
+            if endpoint_name in active:
+                # An outer wrapper already logs this endpoint
+                return f(*args, **kwargs)
+            
             start_time = time.time()
             logger = logging.getLogger('api_logger')
+            active.add(endpoint_name)
             
             try:
                 result = f(*args, **kwargs)
@@ -287,6 +299,9 @@ def log_endpoint(endpoint_name):
                 )
                 
                 raise
+            
+            finally:
+                active.discard(endpoint_name)
         
         return wrapper
     return decorator